@@ -1,13 +1,23 @@
 import streamlit as st
-import google.generativeai as genai
 import requests
-import pandas as pd
-from supabase import create_client
 from datetime import datetime
-import concurrent.futures
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-import random
+import concurrent.futures
+import threading
+from collections import OrderedDict
+import hashlib
+import json
+import copy
+import base64
+import os
+import numpy as np
+from cache_store import build_cache
+from vector_index import LocalVectorIndex, RPC_TABLES, INDEX_DIR, parse_embedding
+from taste_profile import TasteProfile, blend
+from availability_index import AvailabilityIndex, SERVICES, MAX_AGE as AVAILABILITY_MAX_AGE, snapshot_path as availability_path
+from tracing import trace, stage, record_stage, enable_log, METRICS
+import time
 
 # ==============================================================================
 # 1. CONFIGURAÇÃO E SEGREDOS (SUAS CHAVES)
@@ -23,15 +33,20 @@ try:
     # GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
     
     TRAKT_CLIENT_ID = st.secrets.get("TRAKT_CLIENT_ID", "") 
+    TRAKT_ACCESS_TOKEN = st.secrets.get("TRAKT_ACCESS_TOKEN", "")  # opcional: habilita /sync/last_activities
+    TRAKT_TOKEN_USER = st.secrets.get("TRAKT_TOKEN_USER", "")  # dono do token acima
     TMDB_API_KEY = st.secrets.get("TMDB_API_KEY", "")
+    CACHE_BACKEND = st.secrets.get("CACHE_BACKEND", "sqlite")  # "sqlite" (local) ou "supabase"
+    USE_LOCAL_INDEX = st.secrets.get("USE_LOCAL_INDEX", False)  # snapshot: python vector_index.py refresh
+    TRACE_LOG = st.secrets.get("TRACE_LOG", False)  # 1 linha JSON por busca no stderr
 
 except:
     st.error("🚨 Erro nas configurações de chaves.")
     st.stop()
 
-genai.configure(api_key=GOOGLE_API_KEY)
 st.set_page_config(page_title="CineGourmet Ultimate", page_icon="🍿", layout="wide")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+if TRACE_LOG: enable_log()
+TMDB_API = "https://api.themoviedb.org/3"
 TMDB_IMAGE = "https://image.tmdb.org/t/p/w500"
 TMDB_LOGO = "https://image.tmdb.org/t/p/original"
 
@@ -39,70 +54,260 @@ TMDB_LOGO = "https://image.tmdb.org/t/p/original"
 # 2. SESSÃO E CACHE
 # ==============================================================================
 
+# Clientes criados sob demanda, uma vez por processo: reruns e páginas que não usam
+# Gemini/Supabase não pagam import nem conexão (benchmark: python bench/startup.py)
+@st.cache_resource
 def get_session():
     session = requests.Session()
-    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retry)
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], respect_retry_after_header=True)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=20)
     session.mount("https://", adapter)
     return session
 
-session = get_session()
+@st.cache_resource
+def get_genai():
+    import google.generativeai as genai
+    genai.configure(api_key=GOOGLE_API_KEY)
+    return genai
 
-@st.cache_data(ttl=3600)
-def get_trakt_profile_data(username, content_type="movies"):
+@st.cache_resource
+def get_supabase():
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Enriquecimento TMDB em massa: asyncio + keep-alive + limitador de taxa (ver http_engine.py)
+@st.cache_resource
+def get_http_engine():
+    from http_engine import AsyncHTTPEngine
+    return AsyncHTTPEngine()
+
+@st.cache_resource
+def get_trakt_engine():
+    from http_engine import AsyncHTTPEngine, TRAKT_RATE, TRAKT_BURST, TRAKT_MAX_CONCURRENCY
+    return AsyncHTTPEngine(rate=TRAKT_RATE, burst=TRAKT_BURST, max_concurrency=TRAKT_MAX_CONCURRENCY, timeout=10.0)
+
+# Cache persistente entre processos/deploys (ver cache_store.py)
+@st.cache_resource
+def get_cache():
+    return build_cache(CACHE_BACKEND, get_supabase() if CACHE_BACKEND == "supabase" else None)
+
+# --- SINCRONIZAÇÃO TRAKT (PAGINADA + INCREMENTAL) ---
+TRAKT_API = "https://api.trakt.tv"
+TRAKT_PAGE_SIZE = 100
+
+def trakt_headers():
     headers = {'Content-Type': 'application/json', 'trakt-api-version': '2', 'trakt-api-key': TRAKT_CLIENT_ID}
-    data = {"history": [], "positive": [], "hated": [], "watched_ids": []}
+    if TRAKT_ACCESS_TOKEN: headers['Authorization'] = f"Bearer {TRAKT_ACCESS_TOKEN}"
+    return headers
+
+def trakt_get(path, params=None):
+    r = get_session().get(TRAKT_API + path, headers=trakt_headers(), params=params, timeout=10)
+    return r if r.status_code == 200 else None
+
+def trakt_get_all_pages(path, params=None, stop=None):
+    # 1ª página síncrona (descobre o total pelo header); as demais saem juntas pelo motor async.
+    # 'stop(item)' corta a paginação no primeiro item já conhecido (modo delta, páginas em sequência).
+    params = dict(params or {}, limit=TRAKT_PAGE_SIZE)
+    first = trakt_get(path, dict(params, page=1))
+    if first is None: return None
+    items = first.json()
+    pages = int(first.headers.get('X-Pagination-Page-Count', 1) or 1)
+    if stop:
+        page, batch = 1, items
+        while page < pages and not any(stop(i) for i in batch):
+            page += 1
+            r = trakt_get(path, dict(params, page=page))
+            if r is None: return None
+            batch = r.json()
+            items += batch
+        return [i for i in items if not stop(i)]
+    if pages > 1:
+        rest = get_trakt_engine().get_many([(TRAKT_API + path, dict(params, page=p), trakt_headers()) for p in range(2, pages + 1)], timeout=60)
+        if any(r is None for r in rest): return None
+        for r in rest: items += r
+    return items
+
+def trakt_activity_marker(username, t_type):
+    # Com token do próprio usuário: 1 requisição em /sync/last_activities.
+    # Outros perfis (públicos): 2 requisições baratas com limit=1.
+    if TRAKT_ACCESS_TOKEN and username == TRAKT_TOKEN_USER:
+        r = trakt_get("/sync/last_activities")
+        if r is not None:
+            acts = r.json().get(t_type, {})
+            return {"watched_at": acts.get('watched_at'), "rated_at": acts.get('rated_at')}
+    h = trakt_get(f"/users/{username}/history/{t_type}", {"limit": 1, "page": 1})
+    rt = trakt_get(f"/users/{username}/ratings/{t_type}", {"limit": 1, "page": 1})
+    if h is None or rt is None: return None
+    h_items, r_items = h.json(), rt.json()
+    return {
+        "watched_at": h_items[0]['watched_at'] if h_items else None,
+        "rated_at": r_items[0]['rated_at'] if r_items else None,
+        "watched_count": h.headers.get('X-Pagination-Item-Count'),
+        "rated_count": rt.headers.get('X-Pagination-Item-Count'),
+    }
+
+def rating_entry(item, item_key):
+    return {"rating": item['rating'], "title": item[item_key]['title'], "rated_at": item['rated_at']}
+
+def trakt_watched_ids(username, t_type, item_key):
+    # /watched não é paginado: uma requisição com todos os títulos vistos
+    watched = trakt_get(f"/users/{username}/watched/{t_type}")
+    return None if watched is None else [i[item_key]['ids']['tmdb'] for i in watched.json() if i[item_key]['ids'].get('tmdb')]
+
+def trakt_ratings(username, t_type, item_key, stop=None):
+    # ({tmdb_id: nota}, nº de notas sem id do TMDB); None se alguma página falhar
+    items = trakt_get_all_pages(f"/users/{username}/ratings/{t_type}", stop=stop)
+    if items is None: return None
+    ratings = {str(i[item_key]['ids']['tmdb']): rating_entry(i, item_key) for i in items if i[item_key]['ids'].get('tmdb')}
+    return ratings, len(items) - len(ratings)
+
+def fetch_trakt_snapshot(username, content_type, snapshot=None):
+    # Remoções (notas apagadas, plays tirados do histórico) não aparecem num delta por data.
+    # Perfil público: o delta só vale se os totais dos headers baterem, senão relê a lista inteira.
+    # Com token (/sync/last_activities não traz totais): marcador mudou = relê a lista inteira.
     t_type = "shows" if content_type == "tv" else "movies"
     item_key = 'show' if content_type == "tv" else 'movie'
-
     try:
-        r_watched = session.get(f"https://api.trakt.tv/users/{username}/watched/{t_type}?limit=1000", headers=headers)
-        if r_watched.status_code == 200:
-            data["watched_ids"] = [i[item_key]['ids']['tmdb'] for i in r_watched.json() if i[item_key]['ids'].get('tmdb')]
-
-        r_ratings = session.get(f"https://api.trakt.tv/users/{username}/ratings/{t_type}?limit=200", headers=headers)
-        if r_ratings.status_code == 200:
-            for item in r_ratings.json():
-                title = item[item_key]['title']
-                rating = item['rating']
-                
-                if rating >= 7:
-                    data["positive"].append((rating, f"{title} ({rating}/10)"))
-                elif rating <= 5:
-                    data["hated"].append(f"{title} ({rating}/10)")
-            
-            data["positive"].sort(key=lambda x: x[0], reverse=True)
-            data["positive"] = [x[1] for x in data["positive"]]
-    except: pass
+        marker = trakt_activity_marker(username, t_type)
+        if snapshot and marker and marker == snapshot.get('marker'): return snapshot  # nada mudou
+
+        if snapshot and marker:
+            old = snapshot['marker']
+            snap = dict(snapshot, watched_ids=list(snapshot['watched_ids']), ratings=dict(snapshot['ratings']))
+            if marker.get('watched_at') != old.get('watched_at') or marker.get('watched_count') != old.get('watched_count'):
+                history, last = None, old.get('watched_at')
+                if last and marker.get('watched_count') is not None and old.get('watched_count') is not None:
+                    history = trakt_get_all_pages(f"/users/{username}/history/{t_type}", {"start_at": last})
+                    if history is None: return None
+                    history = [x for x in history if x['watched_at'] > last]
+                    if int(old['watched_count']) + len(history) != int(marker['watched_count']): history = None
+                if history is None:
+                    watched_ids = trakt_watched_ids(username, t_type, item_key)
+                    if watched_ids is None: return None
+                    snap['watched_ids'] = watched_ids
+                else:
+                    known = set(snap['watched_ids'])
+                    snap['watched_ids'] += [i for i in dict.fromkeys(x[item_key]['ids'].get('tmdb') for x in history) if i and i not in known]
+            if marker.get('rated_at') != old.get('rated_at') or marker.get('rated_count') != old.get('rated_count'):
+                merged = None
+                if marker.get('rated_count') is not None:
+                    last = old.get('rated_at') or ""
+                    delta = trakt_ratings(username, t_type, item_key, stop=lambda i: i['rated_at'] <= last)
+                    if delta is None: return None
+                    merged, unmapped = dict(snap['ratings'], **delta[0]), snap.get('unmapped_ratings', 0) + delta[1]
+                    if len(merged) + unmapped == int(marker['rated_count']): snap['unmapped_ratings'] = unmapped
+                    else: merged = None
+                if merged is None:
+                    full = trakt_ratings(username, t_type, item_key)
+                    if full is None: return None
+                    merged, snap['unmapped_ratings'] = full
+                snap['ratings'] = merged
+        else:
+            # Sync completo: /watched numa requisição; /ratings é paginado (páginas em paralelo)
+            watched_ids = trakt_watched_ids(username, t_type, item_key)
+            full = trakt_ratings(username, t_type, item_key)
+            if watched_ids is None or full is None: return None
+            snap = {"watched_ids": watched_ids, "ratings": full[0], "unmapped_ratings": full[1]}
+        snap['marker'] = marker or {}
+        snap['synced_at'] = datetime.now().isoformat()
+        return snap
+    except: return None
+
+def build_profile_data(snapshot):
+    data = {"history": [], "positive": [], "hated": [], "watched_ids": [], "ratings": {}}
+    if not snapshot: return data
+    data["watched_ids"] = snapshot['watched_ids']
+    data["ratings"] = {int(k): v['rating'] for k, v in snapshot['ratings'].items()}
+    rated = sorted(snapshot['ratings'].values(), key=lambda x: (x['rating'], x['rated_at']), reverse=True)
+    data["positive"] = [f"{x['title']} ({x['rating']}/10)" for x in rated if x['rating'] >= 7]
+    data["hated"] = [f"{x['title']} ({x['rating']}/10)" for x in rated if x['rating'] <= 5]
     return data
 
-@st.cache_data(ttl=86400)
-def get_watch_providers(content_id, content_type):
-    url = f"https://api.themoviedb.org/3/{content_type}/{content_id}/watch/providers?api_key={TMDB_API_KEY}"
-    try:
-        r = session.get(url, timeout=5)
-        data = r.json()
-        if 'results' in data and 'BR' in data['results']:
-            br = data['results']['BR']
-            return True, br.get('flatrate', []), br.get('rent', [])
-    except: pass
-    return False, [], []
+def get_trakt_profile_data(username, content_type="movies"):
+    # Snapshot por usuário no cache persistente (SQLite/Supabase); re-sync baixa só o delta
+    cache, key = get_cache(), [username, content_type]
+    snapshot, _ = cache.get("trakt_snapshot", key)
+    fresh = fetch_trakt_snapshot(username, content_type, snapshot)
+    if fresh is not None and fresh is not snapshot: cache.set("trakt_snapshot", key, fresh)
+    return build_profile_data(fresh or snapshot)
 
-@st.cache_data(ttl=86400)
-def get_trailer_url(content_id, content_type):
-    url = f"https://api.themoviedb.org/3/{content_type}/{content_id}/videos?api_key={TMDB_API_KEY}&language=pt-BR"
-    try:
-        r = session.get(url, timeout=5)
-        data = r.json()
-        if 'results' in data:
-            for v in data['results']:
-                if v['site'] == 'YouTube' and v['type'] == 'Trailer': return f"https://www.youtube.com/watch?v={v['key']}"
-            url_en = f"https://api.themoviedb.org/3/{content_type}/{content_id}/videos?api_key={TMDB_API_KEY}&language=en-US"
-            r_en = session.get(url_en)
-            for v in r_en.json().get('results', []):
-                if v['site'] == 'YouTube' and v['type'] == 'Trailer': return f"https://www.youtube.com/watch?v={v['key']}"
-    except: pass
-    return None
+def compact_providers(providers):
+    return [{k: p.get(k) for k in ('provider_id', 'provider_name', 'logo_path')} for p in providers]
+
+def pick_trailer(videos):
+    trailers = [v for v in videos if v.get('site') == 'YouTube' and v.get('type') == 'Trailer']
+    # Prioridade: trailer em português, depois em inglês
+    for lang in ('pt', 'en'):
+        for v in trailers:
+            if v.get('iso_639_1') == lang: return f"https://www.youtube.com/watch?v={v['key']}"
+    return f"https://www.youtube.com/watch?v={trailers[0]['key']}" if trailers else None
+
+def tmdb_details_request(content_id, content_type):
+    # Uma única requisição: provedores + vídeos pt/en via append_to_response
+    url = f"{TMDB_API}/{content_type}/{content_id}"
+    params = {"api_key": TMDB_API_KEY, "language": "pt-BR", "append_to_response": "watch/providers,videos", "include_video_language": "pt,en"}
+    return url, params
+
+def parse_tmdb_details(data):
+    details = {"available": False, "flat": [], "rent": [], "trailer": None}
+    if not data: return details
+    results = data.get('watch/providers', {}).get('results', {})
+    if 'BR' in results:
+        br = results['BR']
+        details.update(available=True, flat=compact_providers(br.get('flatrate', [])), rent=compact_providers(br.get('rent', [])))
+    details['trailer'] = pick_trailer(data.get('videos', {}).get('results', []))
+    # Campos de exibição: dashboards guardam só ids e se reidratam a partir deste cache
+    details['info'] = {k: data[k] for k in ('overview', 'poster_path', 'vote_average', 'release_date', 'first_air_date') if data.get(k) is not None}
+    details['info']['title'] = data.get('title') or data.get('name')
+    return details
+
+def load_tmdb_details(content_id, content_type):
+    data = get_http_engine().get_json(*tmdb_details_request(content_id, content_type), timeout=10)
+    return parse_tmdb_details(data) if data is not None else None
+
+def lookup_tmdb_details(content_ids, content_type):
+    # Só cache: devolve ({id: detalhes}, [ids faltantes])
+    cache = get_cache()
+    with stage("tmdb.cache") as sp:
+        hits = cache.get_many("tmdb_details", [(content_type, cid) for cid in content_ids])
+        sp.add(hits=len(hits), misses=len(content_ids) - len(hits))
+    out, missing = {}, []
+    for cid in content_ids:
+        hit = hits.get((content_type, cid))
+        if not hit:
+            missing.append(cid)
+            continue
+        out[cid] = hit[0]
+        # Stale-while-revalidate: devolve o valor antigo e atualiza em segundo plano
+        if hit[1] == "stale": cache.revalidate("tmdb_details", (content_type, cid), lambda cid=cid: load_tmdb_details(cid, content_type))
+    return out, missing
+
+def submit_tmdb_details(content_ids, content_type):
+    # Um Future por título, para quem quer consumir em as_completed
+    engine = get_http_engine()
+    return {engine.submit(*tmdb_details_request(cid, content_type)): cid for cid in content_ids}
+
+def store_tmdb_details(content_id, content_type, data):
+    details = parse_tmdb_details(data)
+    # Falhas de rede não ficam no cache
+    if data is not None: get_cache().set("tmdb_details", (content_type, content_id), details)
+    return details
+
+def fetch_tmdb_details(content_ids, content_type):
+    # Todas as faltas saem juntas pelo motor async: ~1 RTT por lote em vez de 1 RTT por item
+    with stage("tmdb.fetch", calls=len(content_ids)):
+        payloads = get_http_engine().get_many([tmdb_details_request(cid, content_type) for cid in content_ids], timeout=15)
+    out, fresh = {}, {}
+    for cid, data in zip(content_ids, payloads):
+        out[cid] = parse_tmdb_details(data)
+        if data is not None: fresh[(content_type, cid)] = out[cid]
+    get_cache().set_many("tmdb_details", fresh)
+    return out
+
+def get_tmdb_details_many(content_ids, content_type):
+    out, missing = lookup_tmdb_details(content_ids, content_type)
+    if missing: out.update(fetch_tmdb_details(missing, content_type))
+    return out
 
 def get_trakt_url(content_id, content_type):
     type_slug = "movie" if content_type == "movie" else "show"
@@ -117,48 +322,161 @@ def build_context_string(data):
         c += f"O USUÁRIO DETESTOU/EVITAR (1-5): {', '.join(data['hated'][:20])}. "
     return c
 
+# --- EMBEDDINGS COM CACHE (MEMÓRIA + PERSISTENTE) ---
+EMBED_MODEL = "models/text-embedding-004"
+EMBED_MEMORY_MAX = 512
+
+@st.cache_resource
+def get_embedding_memory():
+    return OrderedDict()
+
+@st.cache_resource
+def get_embedding_lock():
+    # A memória é do processo: sessões e threads do pré-cálculo leem e gravam ao mesmo tempo
+    return threading.Lock()
+
+def normalize_prompt(text):
+    return " ".join((text or "").lower().split())
+
+def embed_query(text, model=EMBED_MODEL):
+    # Chave: (modelo, texto normalizado) -> vetor float32. "Surpreenda-me" repete o mesmo prompt por perfil.
+    key = (model, hashlib.sha1(normalize_prompt(text).encode("utf-8")).hexdigest())
+    memory, lock = get_embedding_memory(), get_embedding_lock()
+    with stage("embed") as sp:
+        with lock:
+            vector = memory.get(key)
+            if vector is not None: memory.move_to_end(key)
+        if vector is not None:
+            sp.add(hits=1)
+            return vector
+        stored, state = get_cache().get("embedding", list(key))
+        if state:
+            sp.add(hits=1)
+            vector = np.frombuffer(base64.b64decode(stored), dtype=np.float32)
+        else:
+            sp.add(misses=1, calls=1, bytes=len(text.encode("utf-8")))
+            vector = np.asarray(get_genai().embed_content(model=model, content=text)['embedding'], dtype=np.float32)
+            get_cache().set("embedding", list(key), base64.b64encode(vector.tobytes()).decode("ascii"))
+    with lock:
+        memory[key] = vector
+        while len(memory) > EMBED_MEMORY_MAX: memory.popitem(last=False)
+    return vector
+
 # --- FUNÇÃO DE BUSCA DIRETA (PARA O ORÁCULO) ---
-@st.cache_data(ttl=3600)
-def search_tmdb_by_name(query, content_type):
-    url = f"https://api.themoviedb.org/3/search/{content_type}"
+def fetch_tmdb_search(query, content_type):
+    url = f"{TMDB_API}/search/{content_type}"
     params = {"api_key": TMDB_API_KEY, "query": query, "language": "pt-BR", "page": 1}
     try:
-        r = session.get(url, params=params)
+        r = get_session().get(url, params=params, timeout=5)
         if r.status_code == 200:
             return r.json().get('results', [])
     except: pass
-    return []
+    return None
+
+def search_key(query, content_type):
+    return (content_type, " ".join(query.lower().split()))
+
+@st.cache_data(ttl=3600)
+def search_tmdb_by_name(query, content_type):
+    return get_cache().fetch("tmdb_search", search_key(query, content_type), lambda: fetch_tmdb_search(query, content_type)) or []
+
+def search_tmdb_many(queries, content_type):
+    # Lista colada no Oráculo: cache primeiro, o resto sai junto pelo motor async
+    cache = get_cache()
+    keys = {q: search_key(q, content_type) for q in queries}
+    hits = cache.get_many("tmdb_search", list(keys.values()))
+    out = {q: hits[k][0] for q, k in keys.items() if k in hits}
+    # Uma requisição por chave normalizada ("Duna" e "duna " são a mesma busca)
+    missing = list({keys[q]: q for q in queries if q not in out}.values())
+    if missing:
+        with stage("tmdb.search", calls=len(missing)):
+            payloads = get_http_engine().get_many([(f"{TMDB_API}/search/{content_type}", {"api_key": TMDB_API_KEY, "query": q, "language": "pt-BR", "page": 1}) for q in missing], timeout=15)
+        fresh = {keys[q]: data.get('results', []) for q, data in zip(missing, payloads) if data is not None}
+        cache.set_many("tmdb_search", fresh)
+        out.update({q: fresh.get(keys[q], []) for q in queries if q not in out})
+    return out
+
+# --- ORÁCULO (VEREDITOS EM LOTE, MEMOIZADOS POR PERFIL + TÍTULO) ---
+ORACLE_FALLBACK = {"score": 50, "verdict": "Incerto", "reason": "Erro na análise."}
+ORACLE_BATCH_MAX = 25
 
-def oracle_analysis(target_item, user_context):
+def oracle_batch(items, user_context):
+    # Um único pedido estruturado para vários títulos: {id: {"score", "verdict", "reason"}}
+    if not items: return {}
+    targets = "\n".join([
+        f'- ID {i["id"]}: "{i.get("title") or i.get("name")}" (Nota Pública: {i.get("vote_average")}). Sinopse: {(i.get("overview") or "")[:400]}'
+        for i in items
+    ])
     prompt = f"""
     Atue como um algoritmo de compatibilidade de cinema.
     PERFIL DO USUÁRIO: {user_context}
     
-    ALVO DA ANÁLISE:
-    Título: {target_item['title']} (Nota Pública: {target_item.get('vote_average')})
-    Sinopse: {target_item['overview']}
+    ALVOS DA ANÁLISE:
+    {targets}
     
     TAREFA:
-    Calcule a compatibilidade entre o usuário e este título específico.
+    Calcule a compatibilidade entre o usuário e cada título, de forma independente.
     
-    SAÍDA ESPERADA (3 linhas exatas):
-    Linha 1: [Número de 0 a 100]
-    Linha 2: [Veredito curto]
-    Linha 3: [Explicação de 1 frase]
+    SAÍDA:
+    Responda APENAS com um objeto JSON no formato {{"<ID>": {{"score": <0 a 100>, "verdict": "<veredito curto>", "reason": "<explicação de 1 frase>"}}}}, uma entrada por título.
     """
     try:
-        model = genai.GenerativeModel('models/gemini-2.0-flash')
-        return model.generate_content(prompt).text.strip()
-    except: return "50\nIncerto\nErro na análise."
+        with stage("oracle", calls=1, bytes=len(prompt.encode("utf-8"))):
+            model = get_genai().GenerativeModel('models/gemini-2.0-flash')
+            resp = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+        out = {}
+        for k, v in json.loads(resp.text).items():
+            if not str(k).strip().isdigit() or not isinstance(v, dict): continue
+            try: score = max(0, min(100, int(float(v.get("score")))))
+            except (TypeError, ValueError): continue
+            out[int(k)] = {"score": score, "verdict": str(v.get("verdict") or "").strip(), "reason": str(v.get("reason") or "").strip()}
+        return out
+    except: return {}
+
+def get_oracle_verdicts(items, user_context, content_type):
+    # Mesmo perfil + mesmo título = mesmo veredito: só os inéditos vão ao LLM
+    p_hash, cache = profile_hash(user_context), get_cache()
+    keys = {i['id']: [p_hash, content_type, i['id']] for i in items}
+    hits = cache.get_many("oracle", list(keys.values()))
+    verdicts = {cid: hits[tuple(key)][0] for cid, key in keys.items() if tuple(key) in hits}
+    missing = [i for i in items if i['id'] not in verdicts]
+    fresh = {}
+    for start in range(0, len(missing), ORACLE_BATCH_MAX):
+        fresh.update(oracle_batch(missing[start:start + ORACLE_BATCH_MAX], user_context))
+    # Falhas não entram no cache para serem tentadas de novo
+    cache.set_many("oracle", {tuple(keys[cid]): v for cid, v in fresh.items() if cid in keys})
+    verdicts.update(fresh)
+    return {i['id']: verdicts.get(i['id'], ORACLE_FALLBACK) for i in items}
+
+# --- EXPLICAÇÕES EM LOTE (1 CHAMADA PARA TODOS OS CARDS) ---
+EXPLAIN_FALLBACK = "Recomendação baseada no seu perfil."
+EXPLAIN_CACHE_MAX = 2000
+
+@st.cache_resource
+def get_explanation_cache():
+    return OrderedDict()
 
-def explain_choice(title, context_str, user_query, overview, rating):
+@st.cache_resource
+def get_explanation_lock():
+    return threading.Lock()
+
+def profile_hash(context_str):
+    return hashlib.md5((context_str or "").encode("utf-8")).hexdigest()
+
+def explain_batch(items, context_str, user_query):
+    if not items: return {}
+    candidates = "\n".join([
+        f'- ID {i["id"]}: "{i["title"]}" (Nota: {float(i.get("vote_average", 0) or 0):.1f}/10). Sinopse: {(i.get("overview") or "")[:400]}'
+        for i in items
+    ])
     prompt = f"""
     Atue como um amigo cinéfilo SINCERO e 'pé no chão'.
     CONTEXTO:
     - O usuário gosta de: {context_str}
     - Ele pediu: "{user_query}"
-    - Filme sugerido: "{title}" (Nota: {rating}/10).
-    - Sinopse: {overview}
+    
+    FILMES SUGERIDOS:
+    {candidates}
     
     REGRA DE OURO (LEIA COM ATENÇÃO):
     1. JAMAIS compare filmes infantis/comédias bobas com clássicos sérios.
@@ -166,12 +484,34 @@ def explain_choice(title, context_str, user_query, overview, rating):
     3. Se o filme for desconhecido mas tiver nota alta, seja cético.
     
     SAÍDA:
-    Escreva apenas UMA frase (max 25 palavras) explicando o apelo do filme de forma honesta.
+    Responda APENAS com um objeto JSON no formato {{"<ID>": "<frase>"}}, uma entrada por filme.
+    Cada frase deve ter no máximo 25 palavras e explicar o apelo do filme de forma honesta.
     """
     try:
-        model = genai.GenerativeModel('models/gemini-2.0-flash') 
-        return model.generate_content(prompt).text.strip()
-    except: return "Recomendação baseada no seu perfil."
+        with stage("explain", calls=1, bytes=len(prompt.encode("utf-8"))):
+            model = get_genai().GenerativeModel('models/gemini-2.0-flash')
+            resp = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+        parsed = json.loads(resp.text)
+        return {int(k): str(v).strip() for k, v in parsed.items() if str(k).strip().isdigit() and v}
+    except: return {}
+
+def attach_explanations(items, context_str, user_query):
+    cache, lock = get_explanation_cache(), get_explanation_lock()
+    p_hash = profile_hash(context_str)
+    with lock: missing = [i for i in items if (p_hash, user_query, i['id']) not in cache]
+    record_stage("explain.cache", 0.0, hits=len(items) - len(missing), misses=len(missing))
+    # A chamada ao Gemini fica fora do lock; só leitura/escrita do OrderedDict é serializada
+    fresh = explain_batch(missing, context_str, user_query) if missing else {}
+    with lock:
+        for i in missing:
+            # Falhas não entram no cache para serem tentadas de novo na próxima busca
+            if i['id'] in fresh: cache[(p_hash, user_query, i['id'])] = fresh[i['id']]
+        while len(cache) > EXPLAIN_CACHE_MAX: cache.popitem(last=False)
+        for i in items:
+            key = (p_hash, user_query, i['id'])
+            if key in cache: cache.move_to_end(key)
+            i['explanation'] = cache.get(key, EXPLAIN_FALLBACK)
+    return items
 
 def generate_marathon_plan(items, user_query):
     candidates = "\n".join([f"- {i['title']} (ID: {i['id']})" for i in items[:10]])
@@ -182,7 +522,7 @@ def generate_marathon_plan(items, user_query):
     Retorne formato lista: 1. Nome - Motivo.
     """
     try:
-        model = genai.GenerativeModel('models/gemini-2.0-flash')
+        model = get_genai().GenerativeModel('models/gemini-2.0-flash')
         return model.generate_content(prompt).text.strip()
     except: return "Erro ao gerar maratona."
 
@@ -195,21 +535,153 @@ def convert_list_to_text(items, username):
         txt += f"{i+1}. {item['title']} ({year}) - ⭐ {rating:.1f}\n"
     return txt
 
+# --- RECUPERAÇÃO VETORIAL (ÍNDICE LOCAL OU RPC) ---
+def snapshot_mtime(table):
+    try: return os.path.getmtime(os.path.join(INDEX_DIR, table + ".npy"))
+    except OSError: return 0
+
+@st.cache_resource(max_entries=2)
+def load_local_index(table, mtime):
+    # mtime na chave: um refresh do snapshot troca o índice sem reiniciar o app
+    # (max_entries=2: um por tabela; o snapshot antigo sai do cache e o mmap é liberado)
+    return LocalVectorIndex.load(table)
+
+def match_candidates(db_func, vector, match_threshold, match_count, filter_ids, username=None):
+    # Devolve as mesmas linhas do RPC, então process_batch_parallel não muda
+    if USE_LOCAL_INDEX:
+        table = RPC_TABLES[db_func]
+        index = load_local_index(table, snapshot_mtime(table))
+        if index is not None:
+            with stage("local_index"): return index.match(vector, match_threshold, match_count, filter_ids)
+    if username:
+        # Exclusões já gravadas no banco (user_exclusions): o payload leva só o vetor
+        params = {"query_embedding": vector.tolist(), "match_threshold": match_threshold, "match_count": match_count, "p_username": username}
+        try:
+            with stage("rpc", calls=1, bytes=len(json.dumps(params))): return get_supabase().rpc(f"{db_func}_for_user", params).execute().data or []
+        except: pass
+    params = {"query_embedding": vector.tolist(), "match_threshold": match_threshold, "match_count": match_count, "filter_ids": list(filter_ids)}
+    with stage("rpc", calls=1, bytes=len(json.dumps(params))):
+        resp = get_supabase().rpc(db_func, params).execute()
+    return resp.data or []
+
 # ==============================================================================
 # 3. LÓGICA HÍBRIDA & PARALELA
 # ==============================================================================
 
-def calculate_hybrid_score(item):
-    sim_score = float(item.get('similarity', 0))
-    vote = float(item.get('vote_average', 0) or 0)
-    rating_score = (vote / 10.0) ** 2 
-    pop = float(item.get('popularity', 0) or 0)
-    pop_score = min(pop / 1000.0, 1.0)
-    chaos = random.random() * 0.05
-    return (sim_score * 0.70) + (rating_score * 0.20) + (pop_score * 0.05) + chaos
-
-def process_single_item(item, api_type, my_services):
-    is_ok, flat, rent = get_watch_providers(item['id'], api_type)
+RANK_WEIGHTS = {"similarity": 0.70, "rating": 0.20, "popularity": 0.05, "diversity": 0.05}
+MMR_LAMBDA = 0.75
+
+def diversity_jitter(ids, seed):
+    # Substitui o random.random(): mesmo (seed, id) -> mesmo valor em [0, 1), independente da ordem das linhas
+    x = (np.asarray(ids, dtype=np.uint64) * np.uint64(2654435761) + np.uint64(seed % 2**32)) % np.uint64(2**32)
+    x ^= x >> np.uint64(16)
+    x = (x * np.uint64(0x45d9f3b)) % np.uint64(2**32)
+    x ^= x >> np.uint64(16)
+    return x.astype(np.float64) / 2**32
+
+def to_frame(rows):
+    # pandas só é importado na primeira busca ranqueada, fora do cold start
+    import pandas as pd
+    return pd.DataFrame(rows)
+
+def numeric_column(df, name):
+    import pandas as pd
+    return pd.to_numeric(df[name], errors='coerce').fillna(0).to_numpy(float) if name in df else np.zeros(len(df))
+
+def hybrid_scores(df, weights=RANK_WEIGHTS, seed=0):
+    vote, pop = numeric_column(df, 'vote_average'), numeric_column(df, 'popularity')
+    return (numeric_column(df, 'similarity') * weights["similarity"]
+            + (vote / 10.0) ** 2 * weights["rating"]
+            + np.minimum(pop / 1000.0, 1.0) * weights["popularity"]
+            + diversity_jitter(df['id'].to_numpy(), seed) * weights["diversity"])
+
+def mmr_order(scores, embeddings, mmr_lambda=MMR_LAMBDA, top=None):
+    # Maximal Marginal Relevance: troca um pouco de score por distância dos já escolhidos
+    n = len(scores)
+    top = min(top or n, n)
+    rel = (scores - scores.min()) / ((scores.max() - scores.min()) or 1.0)
+    chosen, max_sim = [], np.full(n, -np.inf)
+    available = np.ones(n, dtype=bool)
+    for _ in range(top):
+        penalty = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        mmr = np.where(available, mmr_lambda * rel - (1 - mmr_lambda) * penalty, -np.inf)
+        pick = int(np.argmax(mmr))
+        chosen.append(pick)
+        available[pick] = False
+        max_sim = np.maximum(max_sim, embeddings @ embeddings[pick])
+    rest = [i for i in np.argsort(-scores) if available[i]]
+    return chosen + rest
+
+def rank_candidates(rows, weights=RANK_WEIGHTS, seed=0, embeddings=None, mmr_lambda=MMR_LAMBDA, mmr_top=None):
+    # Score de todas as linhas do RPC de uma vez; estável entre reruns para o mesmo seed
+    if not rows: return []
+    with stage("rank"):
+        df = to_frame(rows)
+        scores = hybrid_scores(df, weights, seed)
+        order = mmr_order(scores, embeddings, mmr_lambda, mmr_top) if embeddings is not None else np.argsort(-scores, kind="stable")
+        return [dict(rows[i], hybrid_score=float(scores[i]), rank=pos) for pos, i in enumerate(order)]
+
+def ranking_seed(context_str, user_query):
+    return int(profile_hash(f"{context_str}|{user_query}")[:8], 16)
+
+def catalog_vectors(ids, api_type):
+    # Embeddings já gravados no catálogo: snapshot local se houver, o resto direto da tabela
+    table = "tv_shows" if api_type == "tv" else "movies"
+    out = {}
+    if USE_LOCAL_INDEX:
+        index = load_local_index(table, snapshot_mtime(table))
+        if index is not None: out = index.vectors_by_id(ids)
+    missing = [i for i in ids if i not in out]
+    try:
+        for start in range(0, len(missing), 200):
+            with stage("taste.vectors", calls=1):
+                rows = get_supabase().table(table).select("id, embedding").in_("id", missing[start:start + 200]).execute().data
+            for r in rows:
+                if r.get('embedding') is not None: out[r['id']] = np.asarray(parse_embedding(r['embedding']), dtype=np.float32)
+    except: pass
+    return out
+
+def get_taste_vector(username, api_type, ratings):
+    # Calculado no sync e guardado no cache; re-syncs só buscam os vetores das notas novas/alteradas
+    cache, key = get_cache(), [username, api_type]
+    stored, _ = cache.get("taste_profile", key)
+    profile = TasteProfile.from_json(stored)
+    with stage("taste") as sp:
+        changed = profile.update(ratings, lambda ids: catalog_vectors(ids, api_type))
+        sp.add(hits=len(ratings) - changed, misses=changed)
+    if changed or stored is None: cache.set("taste_profile", key, profile.to_json())
+    return profile.vector()
+
+def taste_vector():
+    return st.session_state.get('taste_vector')
+
+def candidate_embeddings(rows, api_type):
+    # Só o índice local tem os vetores dos candidatos à mão (o RPC não devolve embeddings)
+    if not USE_LOCAL_INDEX or not rows: return None
+    table = "tv_shows" if api_type == "tv" else "movies"
+    index = load_local_index(table, snapshot_mtime(table))
+    return index.vectors_for([r['id'] for r in rows]) if index is not None else None
+
+MIN_WAVE = 10
+
+@st.cache_resource(max_entries=2)
+def load_availability_index(content_type, mtime):
+    return AvailabilityIndex.load(content_type)
+
+def prefilter_available(items, api_type, my_services):
+    # Descarta sem HTTP o que o índice sabe não estar em nenhum streaming escolhido (nem para alugar)
+    try: mtime = os.path.getmtime(availability_path(api_type))
+    except OSError: return items
+    if not items or not my_services or time.time() - mtime > AVAILABILITY_MAX_AGE: return items
+    index = load_availability_index(api_type, mtime)
+    if index is None: return items
+    with stage("availability") as s:
+        keep, known = index.keep_mask([i['id'] for i in items], my_services)
+        s.add(hits=int(known.sum()), misses=int(len(items) - known.sum()))
+    return [i for i, k in zip(items, keep) if k]
+
+def check_availability(item, my_services, details):
+    flat, rent = details['flat'], details['rent']
     
     has_service = False
     if my_services:
@@ -221,51 +693,325 @@ def process_single_item(item, api_type, my_services):
     if has_service or rent:
         item['providers_flat'] = flat
         item['providers_rent'] = rent
-        item['trailer'] = get_trailer_url(item['id'], api_type)
-        item['trakt_url'] = get_trakt_url(item['id'], api_type)
-        item['hybrid_score'] = calculate_hybrid_score(item)
         return item
     return None
 
-def process_batch_parallel(items, api_type, my_services, limit=5):
-    results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = [executor.submit(process_single_item, item, api_type, my_services) for item in items]
-        for future in concurrent.futures.as_completed(futures):
-            res = future.result()
-            if res: results.append(res)
-    results.sort(key=lambda x: x['hybrid_score'], reverse=True)
-    return results[:limit]
+def finalize_item(item, api_type, details):
+    # hybrid_score já vem do rank_candidates
+    item['trailer'] = details['trailer']
+    item['trakt_url'] = get_trakt_url(item['id'], api_type)
+    return item
+
+def oracle_consult(items, api_type, context_str):
+    # TMDB (provedores + trailer) sai pelo motor async enquanto o LLM responde
+    found, missing = lookup_tmdb_details([i['id'] for i in items], api_type)
+    futures = submit_tmdb_details(missing, api_type)
+    verdicts = get_oracle_verdicts(items, context_str, api_type)
+    done, pending = concurrent.futures.wait(futures, timeout=15)
+    for f in pending: f.cancel()
+    for f, cid in futures.items():
+        found[cid] = store_tmdb_details(cid, api_type, f.result() if f in done and f.exception() is None else None)
+    return [dict(i, title=i.get('title') or i.get('name'), providers_flat=found[i['id']]['flat'], providers_rent=found[i['id']]['rent'],
+                 trailer=found[i['id']]['trailer'], trakt_url=get_trakt_url(i['id'], api_type), **verdicts[i['id']]) for i in items]
+
+def new_candidate_pool(items, api_type, my_services, context_str=None, user_query=None, diversify=False, mmr_top=20):
+    # Pool ranqueado + cursor de enriquecimento: guardado no session_state, "mais resultados"
+    # e a reposição de itens escondidos continuam daqui sem novo embed/RPC
+    # Ranking antes de qualquer HTTP: tudo que o score usa já vem nas linhas do RPC
+    items = prefilter_available(items, api_type, my_services)
+    ranked = rank_candidates(items, seed=ranking_seed(context_str, user_query), embeddings=candidate_embeddings(items, api_type) if diversify else None, mmr_top=mmr_top)
+    return {"ranked": ranked, "cursor": 0, "pending": [], "results": [], "api_type": api_type, "my_services": list(my_services),
+            "context_str": context_str, "user_query": user_query}
+
+def pool_has_more(pool, shown):
+    return len(pool['results']) > shown or bool(pool['pending']) or pool['cursor'] < len(pool['ranked'])
+
+def pool_needs_advance(pool, limit):
+    # Falta item para o top-k, ou algum adiado por corte antecipado tem rank melhor que o último
+    # mostrado (uma onda de hits de cache pode passar do limit e deixar adiados à frente)
+    results = pool['results']
+    if len(results) < limit: return bool(pool['pending']) or pool['cursor'] < len(pool['ranked'])
+    return any(i['rank'] < results[limit - 1]['rank'] for i in pool['pending'])
+
+def beyond_top_k(pending_items, results, limit):
+    return bool(pending_items) and len(results) >= limit and all(i['rank'] > results[limit - 1]['rank'] for i in pending_items)
+
+def iter_candidate_pool(pool, limit):
+    # Gera o top-k provisório a cada item enriquecido; o último yield é o resultado final
+    api_type, my_services, results, ranked = pool['api_type'], pool['my_services'], pool['results'], pool['ranked']
+    # Ondas em ordem de ranking: para assim que 'limit' itens passam no filtro de streaming
+    while pool_needs_advance(pool, limit):
+        needed = limit - len(results)
+        evaluated = pool['cursor'] - len(pool['pending'])
+        rate = len(results) / evaluated if evaluated and results else 0.5
+        # Top-k já cheio: a onda só reavalia os adiados que podem entrar nele
+        size = max(MIN_WAVE, int(needed / rate) + 1) if needed > 0 else len(pool['pending'])
+        # Itens adiados por um corte antecipado anterior têm rank melhor: entram primeiro
+        wave = pool['pending'] + ranked[pool['cursor']:pool['cursor'] + max(0, size - len(pool['pending']))]
+        pool['cursor'] += len(wave) - len(pool['pending'])
+        pool['pending'] = []
+        by_id = {i['id']: i for i in wave}
+        
+        found, missing = lookup_tmdb_details(list(by_id), api_type)
+        futures = submit_tmdb_details(missing, api_type)
+        for cid, details in found.items():
+            item = check_availability(by_id[cid], my_services, details)
+            if item: results.append(finalize_item(item, api_type, details))
+        results.sort(key=lambda x: x['rank'])
+        if results: yield results[:limit]
+        
+        pending = set(futures)
+        # Corte antecipado: nenhum pendente consegue entrar no top-k atual (vale já para os hits de cache)
+        cut = beyond_top_k([by_id[futures[p]] for p in pending], results, limit)
+        # Tempo de espera do TMDB sem contar o tempo gasto pelo consumidor em cada yield
+        waited, mark = 0.0, time.perf_counter()
+        try:
+            for f in ([] if cut else concurrent.futures.as_completed(futures, timeout=15)):
+                pending.discard(f)
+                cid = futures[f]
+                details = store_tmdb_details(cid, api_type, f.result() if f.exception() is None else None)
+                item = check_availability(by_id[cid], my_services, details)
+                if item:
+                    results.append(finalize_item(item, api_type, details))
+                    results.sort(key=lambda x: x['rank'])
+                    waited += time.perf_counter() - mark
+                    yield results[:limit]
+                    mark = time.perf_counter()
+                if beyond_top_k([by_id[futures[p]] for p in pending], results, limit):
+                    cut = True
+                    break
+        except concurrent.futures.TimeoutError: pass
+        waited += time.perf_counter() - mark
+        if futures: record_stage("tmdb.fetch", waited * 1000, calls=len(futures) - len(pending))
+        for p in pending: p.cancel()
+        # Cortados ficam para a próxima página; os que estouraram o timeout são descartados
+        if cut: pool['pending'] = sorted((by_id[futures[p]] for p in pending), key=lambda x: x['rank'])
+
+def advance_pool(pool, limit, on_update=None):
+    for partial in iter_candidate_pool(pool, limit):
+        if on_update: on_update(partial)
+    results = pool['results'][:limit]
+    # Explicações geradas uma única vez por item; reruns do Streamlit só leem item['explanation']
+    if pool['user_query'] is not None: attach_explanations([i for i in results if 'explanation' not in i], pool['context_str'], pool['user_query'])
+    return results
+
+def process_batch_parallel(items, api_type, my_services, limit=5, context_str=None, user_query=None, on_update=None, diversify=False):
+    pool = new_candidate_pool(items, api_type, my_services, context_str, user_query, diversify, mmr_top=limit * 2)
+    return advance_pool(pool, limit, on_update)
 
 # ==============================================================================
 # 4. PERSISTÊNCIA
 # ==============================================================================
 
+# curated_list compacto: {"version", "type", "stamp", "ids", "scores"}; o resto vem do cache de detalhes
+DASHBOARD_FORMAT = 2
+
 def load_user_dashboard(username):
     try:
-        response = supabase.table("user_dashboards").select("*").eq("trakt_username", username).execute()
+        with stage("dashboard.load", calls=1):
+            response = get_supabase().table("user_dashboards").select("curated_list, preferences, updated_at").eq("trakt_username", username).execute()
         return response.data[0] if response.data else None
     except: return None
 
-def save_user_dashboard(username, curated_list, prefs):
-    data = {"trakt_username": username, "curated_list": curated_list, "preferences": prefs, "updated_at": datetime.now().isoformat()}
-    supabase.table("user_dashboards").upsert(data).execute()
+def save_user_dashboard(username, items, content_type, prefs):
+    now = datetime.now().isoformat()
+    curated = {"version": DASHBOARD_FORMAT, "type": content_type, "stamp": now,
+               "ids": [i['id'] for i in items], "scores": [round(float(i.get('hybrid_score', 0)), 4) for i in items]}
+    data = {"trakt_username": username, "curated_list": curated, "preferences": prefs, "updated_at": now}
+    with stage("dashboard.save", calls=1, bytes=len(json.dumps(data, default=str))):
+        get_supabase().table("user_dashboards").upsert(data).execute()
+    invalidate_dashboard(username)
+
+def get_user_dashboard(username):
+    # Uma leitura por sessão (reruns de expander/botão não voltam ao Supabase); invalidada no save
+    dashboards = st.session_state.setdefault('dashboards', {})
+    if username not in dashboards: dashboards[username] = load_user_dashboard(username)
+    return dashboards[username]
+
+def invalidate_dashboard(username):
+    st.session_state.setdefault('dashboards', {}).pop(username, None)
+    st.session_state.setdefault('dashboard_views', {}).pop(username, None)
+
+def hydrate_dashboard(curated):
+    # ids + scores -> itens para exibição, a partir do cache compartilhado de detalhes do TMDB
+    if isinstance(curated, list): return curated  # formato antigo: itens completos gravados na linha
+    if not curated or curated.get('version') != DASHBOARD_FORMAT: return []
+    content_type = curated['type']
+    details = get_tmdb_details_many(curated['ids'], content_type)
+    # Entradas gravadas antes de existir 'info': relê só essas
+    outdated = [cid for cid, d in details.items() if 'info' not in d]
+    if outdated: details.update(fetch_tmdb_details(outdated, content_type))
+    items = []
+    for cid, score in zip(curated['ids'], curated['scores']):
+        d = details[cid]
+        if 'info' not in d: continue  # falha de rede: fica de fora só nesta visualização
+        items.append(dict(d['info'], id=cid, hybrid_score=score, providers_flat=d['flat'], providers_rent=d['rent'],
+                          trailer=d['trailer'], trakt_url=get_trakt_url(cid, content_type)))
+    return items
+
+def get_dashboard_items(username, dashboard):
+    # Lista renderizada guardada por sessão e por versão do dashboard
+    curated = dashboard.get('curated_list')
+    stamp = curated.get('stamp') if isinstance(curated, dict) else dashboard.get('updated_at')
+    views = st.session_state.setdefault('dashboard_views', {})
+    view = views.get(username)
+    if view and view[0] == stamp: return view[1]
+    with stage("dashboard.hydrate"):
+        items = hydrate_dashboard(curated)
+    if isinstance(curated, list) or len(items) == len(curated.get('ids', [])): views[username] = (stamp, items)
+    return items
 
 def save_block(username, content_id, content_type):
     data = {"trakt_username": username, "content_id": content_id, "content_type": content_type, "action": "block"}
-    try: supabase.table("user_feedback").upsert(data, on_conflict="trakt_username, content_id").execute()
+    try: get_supabase().table("user_feedback").upsert(data, on_conflict="trakt_username, content_id").execute()
     except: pass
+    append_exclusions(username, content_type, [content_id])
+
+def append_exclusions(username, content_type, content_ids):
+    rows = [{"trakt_username": username, "content_type": content_type, "content_id": cid} for cid in content_ids]
+    try:
+        for start in range(0, len(rows), 1000):
+            get_supabase().table("user_exclusions").upsert(rows[start:start + 1000], ignore_duplicates=True).execute()
+        return True
+    except: return False
+
+def store_exclusion_set(username, content_type, content_ids):
+    # Só envia o que ainda não foi gravado nesta sessão; reenviar é idempotente
+    stored = st.session_state.setdefault('stored_exclusions', {}).setdefault((username, content_type), set())
+    new_ids = sorted(set(content_ids) - stored)
+    if not append_exclusions(username, content_type, new_ids): return False
+    stored.update(new_ids)
+    return True
+
+def get_blocked_ids():
+    # Conjunto local (O(1) por checagem); montado no sync e incrementado a cada bloqueio
+    return st.session_state.setdefault('blocked_ids', set())
+
+def block_item(username, content_id, content_type):
+    get_blocked_ids().add(content_id)
+    if username: save_block(username, content_id, content_type)
+
+def exclusion_user():
+    # Só usa o RPC *_for_user quando o conjunto do servidor está em dia com este perfil
+    return st.session_state.get('exclusions_user')
 
 def get_user_blacklist(username, content_type):
     try:
-        response = supabase.table("user_feedback").select("content_id").eq("trakt_username", username).eq("content_type", content_type).execute()
+        response = get_supabase().table("user_feedback").select("content_id").eq("trakt_username", username).eq("content_type", content_type).execute()
         return [x['content_id'] for x in response.data]
     except: return []
 
+# --- PRÉ-CÁLCULO EM SEGUNDO PLANO (SURPREENDA-ME / CURADORIA VIP) ---
+# lista -> (prompt, candidatos no RPC, limit, diversificar, user_query das explicações)
+PRECOMPUTE_JOBS = {
+    "surpresa": ("Analise: {context}. Recomende algo que ele vai AMAR.", 60, 10, False, "Surpresa"),
+    "vip": ("Analise: {context}. Recomende 30 obras-primas não vistas.", 120, 30, True, None),
+}
+
+@st.cache_resource
+def get_precompute_executor():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="precompute")
+
+@st.cache_resource
+def get_precompute_jobs():
+    # (usuário, tipo, lista) -> (fingerprint, Future | None) do último pré-cálculo agendado
+    return {}
+
+def recommendation_fingerprint(kind, context_str, blocked_ids, my_services, threshold, taste=None):
+    # Muda com o perfil, a blacklist, os streamings ou a ousadia: o pré-cálculo antigo deixa de valer
+    taste_hash = hashlib.md5(taste.tobytes()).hexdigest() if taste is not None else None
+    payload = json.dumps([kind, profile_hash(context_str), taste_hash, sorted(blocked_ids), sorted(my_services), round(threshold, 3)])
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+def compute_recommendations(kind, context_str, db_func, api_type, my_services, threshold, blocked_ids, excl_user=None, on_update=None, taste=None):
+    # Não lê st.session_state: roda tanto no script quanto nas threads do pré-cálculo
+    prompt, count, limit, diversify, user_query = PRECOMPUTE_JOBS[kind]
+    # Com vetor de gosto a busca é o próprio perfil: nenhum embed
+    vector = taste if taste is not None else embed_query(prompt.format(context=context_str))
+    rows = match_candidates(db_func, vector, threshold, count, blocked_ids, excl_user)
+    # Devolve o pool inteiro (não só o top-k): a página pode pedir mais resultados depois
+    pool = new_candidate_pool(rows, api_type, my_services, context_str, user_query, diversify, mmr_top=limit * 2)
+    advance_pool(pool, limit, on_update)
+    return pool
+
+def run_precompute(key, fingerprint, *args, **kwargs):
+    pool = compute_recommendations(*args, **kwargs)
+    get_cache().set("precomputed", key, {"fingerprint": fingerprint, "pool": pool})
+    return pool
+
+def schedule_precompute(username, context_str, db_func, api_type, my_services, threshold, blocked_ids, excl_user=None, taste=None):
+    # Chamado depois de cada sync; só agenda as listas cujo fingerprint mudou
+    jobs = get_precompute_jobs()
+    for kind in PRECOMPUTE_JOBS:
+        key = (username, api_type, kind)
+        fingerprint = recommendation_fingerprint(kind, context_str, blocked_ids, my_services, threshold, taste)
+        current = jobs.get(key)
+        if current and current[0] == fingerprint: continue
+        if current and current[1]: current[1].cancel()
+        stored, _ = get_cache().get("precomputed", list(key))
+        if stored and stored.get('fingerprint') == fingerprint:
+            jobs[key] = (fingerprint, None)
+            continue
+        # Cópias: o conjunto da sessão continua mudando enquanto o job roda
+        jobs[key] = (fingerprint, get_precompute_executor().submit(run_precompute, list(key), fingerprint, kind, context_str, db_func, api_type, list(my_services), threshold, set(blocked_ids), excl_user, taste=taste))
+
+def get_precomputed(username, api_type, kind, fingerprint, timeout=30):
+    # Pool pronto e ainda válido; None se a página precisa calcular na hora
+    with stage("precomputed") as s:
+        current = get_precompute_jobs().get((username, api_type, kind))
+        pool = None
+        if current and current[0] == fingerprint and current[1] and not current[1].cancelled():
+            # Job em andamento com o mesmo fingerprint: esperar sai mais barato que refazer
+            try: pool = current[1].result(timeout=timeout)
+            except Exception: pool = None
+        if pool is None:
+            stored, _ = get_cache().get("precomputed", [username, api_type, kind])
+            if stored and stored.get('fingerprint') == fingerprint: pool = stored.get('pool')
+        s.add(hits=int(pool is not None), misses=int(pool is None))
+    # Cópia: a sessão continua avançando o cursor do pool por conta própria
+    return copy.deepcopy(pool) if pool is not None else None
+
 # ==============================================================================
 # 5. INTERFACE
 # ==============================================================================
 
+def make_stream_renderer(slots_count):
+    # Cards provisórios (sem botões: widgets com key não podem se repetir no mesmo run)
+    slots = [st.empty() for _ in range(slots_count)]
+    shown = [None] * slots_count
+    def render(items):
+        for idx, slot in enumerate(slots):
+            item = items[idx] if idx < len(items) else None
+            if (item['id'] if item else None) == shown[idx]: continue
+            shown[idx] = item['id'] if item else None
+            if item is None:
+                slot.empty()
+                continue
+            with slot.container(border=True):
+                c1, c2 = st.columns([1, 4])
+                with c1:
+                    if item.get('poster_path'): st.image(TMDB_IMAGE + item['poster_path'])
+                with c2:
+                    rating = float(item.get('vote_average', 0) or 0)
+                    st.markdown(f"### {item['title']}")
+                    st.caption(f"⭐ {rating:.1f}/10 | 🧠 CineScore: {int(item.get('hybrid_score', 0) * 100)}")
+                    st.caption("💡 Gerando explicação...")
+    def clear():
+        for slot in slots: slot.empty()
+    return render, clear
+
+def render_debug_panel():
+    last = st.session_state.get('last_trace')
+    if last:
+        st.caption(f"Última operação: **{last['trace']}** em {last['total_ms']:.0f} ms")
+        st.dataframe(last['stages'], hide_index=True, use_container_width=True)
+    else: st.caption("Nenhuma busca instrumentada ainda.")
+    with st.expander("Agregado do processo"):
+        st.dataframe(METRICS.snapshot(), hide_index=True, use_container_width=True)
+        st.caption(f"Cache: {get_cache().stats}")
+        st.caption(f"Motor TMDB: {get_http_engine().stats}")
+        st.download_button("📤 Exportar métricas (JSON)", METRICS.export_json(), file_name="metrics.json")
+
 st.sidebar.title("🍿 CineGourmet")
 
 with st.sidebar:
@@ -283,6 +1029,12 @@ with st.sidebar:
             with st.spinner("Baixando dados..."):
                 st.session_state['trakt_data'] = get_trakt_profile_data(username, api_type)
                 st.session_state['app_blacklist'] = get_user_blacklist(username, api_type)
+                st.session_state['blocked_ids'] = set(st.session_state['trakt_data']['watched_ids']) | set(st.session_state['app_blacklist'])
+                synced = store_exclusion_set(username, api_type, st.session_state['blocked_ids'])
+                st.session_state['exclusions_user'] = username if synced else None
+                st.session_state['taste_vector'] = get_taste_vector(username, api_type, st.session_state['trakt_data']['ratings'])
+                # Pré-cálculo só depois de um sync; agendado abaixo, quando streamings e ousadia já foram lidos
+                st.session_state['precompute_pending'] = True
                 st.success("Sincronizado!")
                 st.rerun()
         else: st.warning("Digite um usuário.")
@@ -294,9 +1046,17 @@ with st.sidebar:
     
     st.divider()
     st.subheader("📺 Streamings")
-    services_list = ["Netflix", "Amazon Prime Video", "Disney Plus", "Max", "Apple TV Plus", "Globoplay"]
+    services_list = SERVICES  # mesma ordem dos bits do índice de disponibilidade
     my_services = st.multiselect("Assinaturas:", services_list, default=services_list)
     threshold = st.slider("Ousadia", 0.0, 1.0, 0.45)
+    
+    # Uma vez por sync. Bloqueio/troca de streaming depois disso só muda o fingerprint: a lista
+    # pré-calculada deixa de valer e a página calcula na hora quando o botão for clicado
+    if st.session_state.pop('precompute_pending', False) and username and 'positive' in (st.session_state.get('trakt_data') or {}):
+        schedule_precompute(username, build_context_string(st.session_state['trakt_data']), db_func, api_type, my_services, threshold, get_blocked_ids(), exclusion_user(), taste_vector())
+    
+    st.divider()
+    if st.toggle("🐞 Debug de performance"): render_debug_panel()
 
 page = st.radio("Modo", ["🔍 Busca Rápida", "🔮 O Oráculo", "🧞 Akinator", "💎 Curadoria VIP"], horizontal=True, label_visibility="collapsed")
 st.divider()
@@ -305,10 +1065,8 @@ st.divider()
 if page == "🔍 Busca Rápida":
     st.title(f"🔍 Busca Turbo: {c_type}")
     context_str = ""
-    full_blocked_ids = []
     if 'trakt_data' in st.session_state and 'positive' in st.session_state['trakt_data']:
         context_str = build_context_string(st.session_state['trakt_data'])
-        full_blocked_ids = st.session_state['trakt_data']['watched_ids'] + st.session_state.get('app_blacklist', [])
         st.info(f"🧠 Personalizado para **{username}**")
 
     query = st.text_area("O que você quer ver?", placeholder="Deixe vazio para 'Surpreenda-me'...")
@@ -318,16 +1076,48 @@ if page == "🔍 Busca Rápida":
         if not query and not context_str:
             st.error("Sincronize o Trakt primeiro!")
             st.stop()
-        final_prompt = f"Pedido: {query}. Contexto: {context_str}" if query else f"Analise: {context_str}. Recomende algo que ele vai AMAR."
-        
-        with st.spinner("IA processando..."):
-            vector = genai.embed_content(model="models/text-embedding-004", content=final_prompt)['embedding']
-            resp = supabase.rpc(db_func, {"query_embedding": vector, "match_threshold": threshold, "match_count": 60, "filter_ids": full_blocked_ids}).execute()
-            
-            if resp.data:
-                st.session_state['search_results'] = process_batch_parallel(resp.data, api_type, my_services, limit=10)
-                st.session_state['current_query'] = query if query else "Surpresa"
-            else: st.session_state['search_results'] = []
+        with trace("busca") as t:
+            pool = None
+            if not query:
+                # Surpreenda-me: normalmente já calculado em segundo plano depois do sync
+                fingerprint = recommendation_fingerprint("surpresa", context_str, get_blocked_ids(), my_services, threshold, taste_vector())
+                pool = get_precomputed(username, api_type, "surpresa", fingerprint) if username else None
+                if pool is None:
+                    render, clear = make_stream_renderer(10)
+                    pool = compute_recommendations("surpresa", context_str, db_func, api_type, my_services, threshold, get_blocked_ids(), exclusion_user(), on_update=render, taste=taste_vector())
+                    clear()
+                st.session_state['current_query'] = "Surpresa"
+            else:
+                with st.spinner("IA processando..."):
+                    # Com vetor de gosto: embed só do pedido (reaproveitável entre usuários) + mistura com o perfil
+                    taste = taste_vector()
+                    vector = blend(embed_query(f"Pedido: {query}."), taste) if taste is not None else embed_query(f"Pedido: {query}. Contexto: {context_str}")
+                    rows = match_candidates(db_func, vector, threshold, 60, get_blocked_ids(), exclusion_user())
+                
+                if rows:
+                    # Os cards aparecem conforme o TMDB responde, em vez de esperar o lote inteiro
+                    render, clear = make_stream_renderer(10)
+                    pool = new_candidate_pool(rows, api_type, my_services, context_str if context_str else "Geral", query)
+                    advance_pool(pool, 10, on_update=render)
+                    st.session_state['current_query'] = query
+                    clear()
+            # Pool inteiro na sessão: "mais resultados" e reposição continuam do cursor
+            st.session_state['search_pool'] = pool
+            st.session_state['search_limit'] = 10
+            st.session_state['search_results'] = pool['results'][:10] if pool else []
+        st.session_state['last_trace'] = t.summary()
+
+    pool = st.session_state.get('search_pool')
+    if pool:
+        # Cada item escondido com "Nunca Mais" é reposto continuando o enriquecimento do pool
+        ignored = set(st.session_state.get('session_ignore', []))
+        target = st.session_state.get('search_limit', 10) + sum(1 for i in pool['results'] if i['id'] in ignored)
+        page_items = pool['results'][:target]
+        if pool_needs_advance(pool, target) or any('explanation' not in i for i in page_items):
+            with trace("busca.mais") as t:
+                with st.spinner("Buscando mais..."): advance_pool(pool, target)
+            st.session_state['last_trace'] = t.summary()
+        st.session_state['search_results'] = pool['results'][:target]
 
     if 'search_results' in st.session_state and st.session_state['search_results']:
         if st.button("🍿 Gerar Roteiro de Maratona (3 Filmes)"):
@@ -346,7 +1136,7 @@ if page == "🔍 Busca Rápida":
                 with c1:
                     if item['poster_path']: st.image(TMDB_IMAGE + item['poster_path'], use_container_width=True)
                     if st.button("🙈 Nunca Mais", key=f"hide_{item['id']}"):
-                        if username: save_block(username, item['id'], api_type)
+                        block_item(username, item['id'], api_type)
                         st.session_state['session_ignore'].append(item['id'])
                         st.rerun()
                     if item.get('providers_flat'):
@@ -364,8 +1154,7 @@ if page == "🔍 Busca Rápida":
                     st.markdown(f"### {item['title']} ({year})")
                     st.caption(f"⭐ {rating:.1f}/10 | 🧠 CineScore: {hybrid}")
                     st.progress(hybrid, text="Qualidade Geral")
-                    expl = explain_choice(item['title'], context_str if context_str else "Geral", st.session_state.get('current_query', ''), item['overview'], rating)
-                    st.success(f"💡 {expl}")
+                    st.success(f"💡 {item.get('explanation', EXPLAIN_FALLBACK)}")
                     b1, b2 = st.columns(2)
                     if item.get('trailer'): b1.link_button("▶️ Trailer", item['trailer'])
                     if item.get('trakt_url'): b2.link_button("📝 Trakt", item['trakt_url'])
@@ -374,6 +1163,11 @@ if page == "🔍 Busca Rápida":
                         st.write(f"**Sinopse:** {item['overview']}")
                 st.divider()
 
+        if pool and pool_has_more(pool, len(st.session_state['search_results'])):
+            if st.button("➕ Mais resultados"):
+                st.session_state['search_limit'] = st.session_state.get('search_limit', 10) + 10
+                st.rerun()
+
 # === PÁGINA 2: O ORÁCULO ===
 elif page == "🔮 O Oráculo":
     st.title(f"🔮 Oráculo de Compatibilidade")
@@ -381,56 +1175,83 @@ elif page == "🔮 O Oráculo":
     
     if 'trakt_data' not in st.session_state: st.error("Sincronize o perfil!")
     else:
-        oracle_query = st.text_input("Nome:", placeholder="ex: Interestelar")
-        if st.button("Procurar"):
-            res = search_tmdb_by_name(oracle_query, api_type)
-            if res: st.session_state['oracle_options'] = res
-            else: st.error("Não encontrado.")
-
-        if 'oracle_options' in st.session_state:
-            options_map = {}
-            for m in st.session_state['oracle_options']:
-                date = m.get('release_date') or m.get('first_air_date', '')
-                year = date[:4] if date else "????"
-                options_map[f"{m.get('title') or m.get('name')} ({year})"] = m
-            
-            selected = st.selectbox("Qual deles?", list(options_map.keys()))
-            target = options_map[selected]
-            
-            if st.button("🔮 Consultar"):
-                with st.spinner("Analisando..."):
-                    target = process_single_item(target, api_type, my_services) or target
-                    context_str = build_context_string(st.session_state['trakt_data'])
-                    oracle_res = oracle_analysis(target, context_str)
-                    
-                    lines = oracle_res.split('\n')
-                    try:
-                        score = int(lines[0].replace('%', '').strip())
-                        verdict = lines[1]
-                        reason = lines[2]
-                    except: score = 50; verdict = "Incerto"; reason = oracle_res
-                    
-                    st.divider()
-                    c1, c2 = st.columns([1, 2])
-                    with c1:
-                         if target.get('poster_path'): st.image(TMDB_IMAGE + target['poster_path'])
-                    with c2:
-                        st.subheader(f"Match: {score}%")
-                        st.progress(score)
-                        if score > 80: st.success(f"🤩 {verdict}")
-                        elif score > 50: st.warning(f"🤔 {verdict}")
-                        else: st.error(f"💀 {verdict}")
-                        st.info(f"🧠 {reason}")
-                        st.write(target['overview'])
+        context_str = build_context_string(st.session_state['trakt_data'])
+        tab_one, tab_list = st.tabs(["🎯 Um título", "📋 Lista de títulos"])
+        
+        with tab_one:
+            oracle_query = st.text_input("Nome:", placeholder="ex: Interestelar")
+            if st.button("Procurar"):
+                res = search_tmdb_by_name(oracle_query, api_type)
+                if res: st.session_state['oracle_options'] = res
+                else: st.error("Não encontrado.")
+
+            if 'oracle_options' in st.session_state:
+                options_map = {}
+                for m in st.session_state['oracle_options']:
+                    date = m.get('release_date') or m.get('first_air_date', '')
+                    year = date[:4] if date else "????"
+                    options_map[f"{m.get('title') or m.get('name')} ({year})"] = m
+                
+                selected = st.selectbox("Qual deles?", list(options_map.keys()))
+                b1, b2 = st.columns(2)
+                
+                if b1.button("🔮 Consultar"):
+                    with st.spinner("Analisando..."):
+                        with trace("oraculo") as t:
+                            target = oracle_consult([options_map[selected]], api_type, context_str)[0]
+                        st.session_state['last_trace'] = t.summary()
+                        score, verdict, reason = target['score'], target['verdict'], target['reason']
+                        
+                        st.divider()
+                        c1, c2 = st.columns([1, 2])
+                        with c1:
+                             if target.get('poster_path'): st.image(TMDB_IMAGE + target['poster_path'])
+                        with c2:
+                            st.subheader(f"Match: {score}%")
+                            st.progress(score)
+                            if score > 80: st.success(f"🤩 {verdict}")
+                            elif score > 50: st.warning(f"🤔 {verdict}")
+                            else: st.error(f"💀 {verdict}")
+                            st.info(f"🧠 {reason}")
+                            st.write(target.get('overview', ''))
+                            if target.get('providers_flat'): st.caption("📺 " + ", ".join(p['provider_name'] for p in target['providers_flat']))
+                            if target.get('trailer'): st.link_button("▶️ Trailer", target['trailer'])
+                
+                if b2.button("⚖️ Comparar todos"):
+                    # Todos os resultados da busca num único pedido ao LLM
+                    with st.spinner("Comparando..."):
+                        with trace("oraculo.lote") as t:
+                            st.session_state['oracle_batch'] = oracle_consult(list({m['id']: m for m in options_map.values()}.values()), api_type, context_str)
+                        st.session_state['last_trace'] = t.summary()
+        
+        with tab_list:
+            pasted = st.text_area("Um título por linha:", placeholder="Interestelar\nA Origem\nDuna")
+            if st.button("⚖️ Comparar lista"):
+                names = list(dict.fromkeys(l.strip() for l in pasted.splitlines() if l.strip()))
+                with st.spinner("Comparando..."):
+                    with trace("oraculo.lista") as t:
+                        # Primeiro resultado de cada nome; títulos repetidos viram um só
+                        hits = search_tmdb_many(names, api_type)
+                        targets = {h[0]['id']: h[0] for h in (hits.get(n) for n in names) if h}
+                        st.session_state['oracle_batch'] = oracle_consult(list(targets.values()), api_type, context_str)
+                    st.session_state['last_trace'] = t.summary()
+                missing = [n for n in names if not hits.get(n)]
+                if missing: st.warning(f"Não encontrados: {', '.join(missing)}")
+        
+        if st.session_state.get('oracle_batch'):
+            st.divider()
+            ranking = sorted(st.session_state['oracle_batch'], key=lambda x: -x['score'])
+            st.dataframe([{"Título": i['title'], "Match": i['score'], "Veredito": i['verdict'], "Motivo": i['reason'],
+                           "Onde ver": ", ".join(p['provider_name'] for p in i.get('providers_flat') or [])} for i in ranking],
+                         column_config={"Match": st.column_config.ProgressColumn("Match", min_value=0, max_value=100, format="%d%%")},
+                         hide_index=True, use_container_width=True)
 
 # === PÁGINA 3: AKINATOR ===
-elif page == "🧞 Akinator (Quiz)":
+elif page == "🧞 Akinator":
     st.title(f"🧞 Akinator: {c_type}")
     context_str = ""
-    full_blocked_ids = []
     if 'trakt_data' in st.session_state and 'positive' in st.session_state['trakt_data']:
         context_str = build_context_string(st.session_state['trakt_data'])
-        full_blocked_ids = st.session_state['trakt_data']['watched_ids'] + st.session_state.get('app_blacklist', [])
 
     with st.form("akinator_form"):
         c1, c2 = st.columns(2)
@@ -445,15 +1266,20 @@ elif page == "🧞 Akinator (Quiz)":
         submit = st.form_submit_button("🧞 Adivinhe")
 
     if submit:
-        prompt = f"Quiz: Vibe {q_mood}, Época {q_era}, Ritmo {q_pace}, Nível {q_comp}, Extra {q_extra}. Perfil: {context_str}"
-        with st.spinner("Pensando..."):
-            vector = genai.embed_content(model="models/text-embedding-004", content=prompt)['embedding']
-            resp = supabase.rpc(db_func, {"query_embedding": vector, "match_threshold": threshold, "match_count": 60, "filter_ids": full_blocked_ids}).execute()
-            if resp.data:
-                st.session_state['search_results'] = process_batch_parallel(resp.data, api_type, my_services, limit=10)
+        quiz = f"Quiz: Vibe {q_mood}, Época {q_era}, Ritmo {q_pace}, Nível {q_comp}, Extra {q_extra}."
+        with trace("akinator") as t:
+            with st.spinner("Pensando..."):
+                taste = taste_vector()
+                vector = blend(embed_query(quiz), taste) if taste is not None else embed_query(f"{quiz} Perfil: {context_str}")
+                rows = match_candidates(db_func, vector, threshold, 60, get_blocked_ids(), exclusion_user())
+            if rows:
+                render, clear = make_stream_renderer(10)
+                st.session_state['search_results'] = process_batch_parallel(rows, api_type, my_services, limit=10, context_str=context_str, user_query="Quiz", on_update=render)
                 st.session_state['current_query'] = "Quiz Akinator"
-                st.rerun()
-            else: st.error("Nada encontrado!")
+                st.session_state.pop('search_pool', None)
+        st.session_state['last_trace'] = t.summary()
+        if rows: st.rerun()
+        else: st.error("Nada encontrado!")
 
     if 'search_results' in st.session_state and st.session_state.get('current_query') == "Quiz Akinator":
         for item in st.session_state['search_results']:
@@ -462,44 +1288,42 @@ elif page == "🧞 Akinator (Quiz)":
                  with c1: st.image(TMDB_IMAGE + item['poster_path'])
                  with c2:
                      st.subheader(item['title'])
-                     st.info(explain_choice(item['title'], context_str, "Quiz", item['overview'], 0))
+                     st.info(item.get('explanation', EXPLAIN_FALLBACK))
 
 # === PÁGINA 4: CURADORIA VIP ===
 elif page == "💎 Curadoria VIP":
     st.title(f"💎 Curadoria Fixa: {c_type}")
     if not username: st.error("Login necessário.")
     else:
-        dashboard = load_user_dashboard(username)
+        dashboard = get_user_dashboard(username)
         btn_text = "🔄 Atualizar Lista" if dashboard else "✨ Gerar Lista"
         
         if st.button(btn_text):
             if 'trakt_data' not in st.session_state: st.error("Sincronize primeiro!")
             else:
                 with st.spinner("Gerando..."):
-                    context_str = build_context_string(st.session_state['trakt_data'])
-                    blocked = st.session_state['trakt_data']['watched_ids'] + st.session_state.get('app_blacklist', [])
-                    prompt = f"Analise: {context_str}. Recomende 30 obras-primas não vistas."
-                    vector = genai.embed_content(model="models/text-embedding-004", content=prompt)['embedding']
-                    resp = supabase.rpc(db_func, {"query_embedding": vector, "match_threshold": threshold, "match_count": 120, "filter_ids": blocked}).execute()
-                    
-                    final = []
-                    if resp.data: final = process_batch_parallel(resp.data, api_type, my_services, limit=30)
-                    
-                    if final:
-                        save_user_dashboard(username, final, {"type": c_type})
-                        st.rerun()
+                    with trace("curadoria") as t:
+                        context_str = build_context_string(st.session_state['trakt_data'])
+                        fingerprint = recommendation_fingerprint("vip", context_str, get_blocked_ids(), my_services, threshold, taste_vector())
+                        pool = get_precomputed(username, api_type, "vip", fingerprint)
+                        if pool is None: pool = compute_recommendations("vip", context_str, db_func, api_type, my_services, threshold, get_blocked_ids(), exclusion_user(), taste=taste_vector())
+                        final = pool['results'][:30]
+                        
+                        if final: save_user_dashboard(username, final, api_type, {"type": c_type})
+                    st.session_state['last_trace'] = t.summary()
+                    if final: st.rerun()
         
-        if dashboard and dashboard.get('curated_list'):
+        items = get_dashboard_items(username, dashboard) if dashboard and dashboard.get('curated_list') else []
+        if items:
             st.divider()
-            text = convert_list_to_text(dashboard['curated_list'], username)
+            text = convert_list_to_text(items, username)
             st.download_button("📤 Baixar", text, file_name="lista.txt")
             
-            items = dashboard['curated_list']
             cols = st.columns(3)
             for idx, item in enumerate(items):
                 with cols[idx % 3]:
                     with st.container(border=True):
-                        if item['poster_path']: st.image(TMDB_IMAGE + item['poster_path'])
+                        if item.get('poster_path'): st.image(TMDB_IMAGE + item['poster_path'])
                         st.markdown(f"**{item['title']}**")
                         if item.get('providers_flat'):
                              # === CORREÇÃO DE INDENTAÇÃO AQUI TAMBÉM ===
@@ -508,4 +1332,4 @@ elif page == "💎 Curadoria VIP":
                                  if i < 4: 
                                     with p_cols[i]: st.image(TMDB_LOGO + p['logo_path'], width=20)
                         
-                        with st.expander("Detalhes"): st.write(item['overview'])
+                        with st.expander("Detalhes"): st.write(item.get('overview', ''))
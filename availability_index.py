@@ -0,0 +1,133 @@
+import os
+import sys
+import numpy as np
+from datetime import datetime
+from vector_index import INDEX_DIR, PAGE_SIZE
+
+# ==============================================================================
+# ÍNDICE DE DISPONIBILIDADE (STREAMINGS NO BR) PARA FILTRAR CANDIDATOS SEM HTTP
+# Tabela content_availability (Supabase, sql/content_availability.sql) + snapshot
+# local por tipo: <dir>/availability_<tipo>.npz  ids (int64 ordenados) + máscara (uint8)
+# Bits 0-5: SERVICES; bit 7: tem aluguel. Título fora do índice = desconhecido.
+# Job periódico (cron diário):  python availability_index.py refresh [movie|tv ...]
+# Outras réplicas só baixam:    python availability_index.py pull [movie|tv ...]
+# ==============================================================================
+
+SERVICES = ["Netflix", "Amazon Prime Video", "Disney Plus", "Max", "Apple TV Plus", "Globoplay"]
+RENT_BIT = 1 << 7
+REGION = "BR"
+MAX_AGE = 3 * 86400  # snapshot mais velho que isso é ignorado pelo app
+TABLE = "content_availability"
+CONTENT_TABLES = {"movie": "movies", "tv": "tv_shows"}
+TMDB_API = "https://api.themoviedb.org/3"
+CHUNK = 500
+
+def service_mask(names):
+    mask = 0
+    for name in names:
+        if name in SERVICES: mask |= 1 << SERVICES.index(name)
+    return mask
+
+def availability_mask(flat_names, has_rent):
+    return service_mask(flat_names) | (RENT_BIT if has_rent else 0)
+
+def snapshot_path(content_type, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, f"availability_{content_type}.npz")
+
+class AvailabilityIndex:
+    def __init__(self, ids, masks):
+        self.ids = ids
+        self.masks = masks
+
+    @classmethod
+    def load(cls, content_type, index_dir=INDEX_DIR):
+        try:
+            with np.load(snapshot_path(content_type, index_dir)) as data: return cls(data["ids"], data["masks"])
+        except (OSError, KeyError): return None
+
+    def keep_mask(self, ids, my_services):
+        # (keep, known): keep=False só quando o índice sabe que o título não está em nenhum
+        # streaming escolhido nem para alugar (mesma regra de check_availability)
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.ids) or not len(ids): return np.ones(len(ids), dtype=bool), np.zeros(len(ids), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        known = self.ids[pos] == ids
+        if not my_services or any(s not in SERVICES for s in my_services): return np.ones(len(ids), dtype=bool), known
+        wanted = service_mask(my_services) | RENT_BIT
+        return ~known | ((self.masks[pos] & wanted) != 0), known
+
+def write_snapshot(content_type, ids, masks, index_dir=INDEX_DIR):
+    ids, masks = np.asarray(ids, dtype=np.int64), np.asarray(masks, dtype=np.uint8)
+    order = np.argsort(ids)
+    # Arquivo temporário + troca atômica, como o snapshot vetorial
+    os.makedirs(index_dir, exist_ok=True)
+    path = snapshot_path(content_type, index_dir)
+    with open(path + ".tmp", "wb") as f: np.savez(f, ids=ids[order], masks=masks[order])
+    os.replace(path + ".tmp", path)
+    return len(ids)
+
+def parse_providers(data, region=REGION):
+    # Resposta de /{tipo}/{id}/watch/providers -> (provider_ids do flatrate, máscara)
+    local = ((data or {}).get("results") or {}).get(region) or {}
+    flat = local.get("flatrate") or []
+    return [p["provider_id"] for p in flat], availability_mask([p.get("provider_name") for p in flat], bool(local.get("rent")))
+
+def content_ids(client, content_type):
+    ids, start = [], 0
+    while True:
+        page = client.table(CONTENT_TABLES[content_type]).select("id").order("id").range(start, start + PAGE_SIZE - 1).execute().data
+        ids += [r["id"] for r in page]
+        if len(page) < PAGE_SIZE: return ids
+        start += PAGE_SIZE
+
+def refresh(client, engine, content_type, api_key, tmdb_api=TMDB_API, index_dir=INDEX_DIR):
+    # Reconsulta o TMDB para todo o catálogo e regrava tabela + snapshot.
+    # Falha numa consulta = título fica fora do índice (o app volta ao TMDB para ele).
+    out_ids, out_masks = [], []
+    ids = content_ids(client, content_type)
+    now = datetime.now().isoformat()
+    for start in range(0, len(ids), CHUNK):
+        chunk = ids[start:start + CHUNK]
+        responses = engine.get_many([(f"{tmdb_api}/{content_type}/{cid}/watch/providers", {"api_key": api_key}) for cid in chunk], timeout=120)
+        rows = []
+        for cid, data in zip(chunk, responses):
+            if data is None: continue
+            provider_ids, mask = parse_providers(data)
+            rows.append({"content_id": cid, "content_type": content_type, "region": REGION, "provider_ids": provider_ids, "service_mask": mask, "updated_at": now})
+            out_ids.append(cid)
+            out_masks.append(mask)
+        if rows: client.table(TABLE).upsert(rows).execute()
+    return write_snapshot(content_type, out_ids, out_masks, index_dir)
+
+def pull(client, content_type, index_dir=INDEX_DIR):
+    # Só baixa a tabela compacta (id + máscara) e grava o snapshot local
+    ids, masks, start = [], [], 0
+    while True:
+        page = (client.table(TABLE).select("content_id, service_mask").eq("content_type", content_type).eq("region", REGION)
+                .order("content_id").range(start, start + PAGE_SIZE - 1).execute().data)
+        for r in page:
+            ids.append(r["content_id"])
+            masks.append(r["service_mask"])
+        if len(page) < PAGE_SIZE: break
+        start += PAGE_SIZE
+    return write_snapshot(content_type, ids, masks, index_dir)
+
+def main(argv):
+    if not argv or argv[0] not in ("refresh", "pull"):
+        print("uso: python availability_index.py refresh|pull [movie|tv ...]")
+        return 1
+    from supabase import create_client
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    types = argv[1:] or list(CONTENT_TABLES)
+    if argv[0] == "pull":
+        for t in types: print(f"{t}: {pull(client, t)} títulos")
+        return 0
+    from http_engine import AsyncHTTPEngine
+    engine = AsyncHTTPEngine(timeout=10.0)
+    try:
+        for t in types: print(f"{t}: {refresh(client, engine, t, os.environ['TMDB_API_KEY'])} títulos")
+    finally: engine.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
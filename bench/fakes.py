@@ -0,0 +1,261 @@
+import copy
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# ==============================================================================
+# SERVIÇOS FALSOS PARA O BENCHMARK (TMDB, TRAKT, GEMINI, SUPABASE)
+# Respostas montadas a partir de bench/fixtures/*.json, com latência,
+# erros 5xx e 429 (Retry-After) configuráveis.
+# ==============================================================================
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PROVIDERS = ["Netflix", "Amazon Prime Video", "Disney Plus", "Max", "Apple TV Plus", "Globoplay"]
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f: return json.load(f)
+
+def stable_random(*parts):
+    return random.Random(hashlib.sha256(repr(parts).encode()).hexdigest())
+
+class Faults:
+    def __init__(self, latency=0.08, jitter=0.3, error_rate=0.0, throttle_rate=0.0, retry_after=0.5, seed=0):
+        self.latency, self.jitter = latency, jitter
+        self.error_rate, self.throttle_rate, self.retry_after = error_rate, throttle_rate, retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self):
+        with self.lock: factor = 1 + self.jitter * (self.rng.random() * 2 - 1)
+        time.sleep(max(0.0, self.latency * factor))
+
+    def roll(self):
+        # None | "throttle" | "error"
+        with self.lock: r = self.rng.random()
+        if r < self.throttle_rate: return "throttle"
+        if r < self.throttle_rate + self.error_rate: return "error"
+        return None
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, name, n=1):
+        with self.lock: self.counts[name] = self.counts.get(name, 0) + n
+
+    def snapshot(self):
+        with self.lock: return dict(self.counts)
+
+class FakeHTTPService:
+    # routes: [(regex do path, nome, handler(match, query) -> (status, payload, headers))]
+    def __init__(self, name, routes, faults):
+        self.name, self.routes, self.faults = name, routes, faults
+        self.counters = Counters()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, como as APIs reais
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                service.faults.delay()
+                for pattern, route, handler in service.routes:
+                    m = re.fullmatch(pattern, url.path)
+                    if not m: continue
+                    service.counters.add(route)
+                    fault = service.faults.roll()
+                    if fault == "throttle":
+                        service.counters.add("429")
+                        return self.reply(429, {"status_message": "rate limit"}, {"Retry-After": str(service.faults.retry_after)})
+                    if fault == "error":
+                        service.counters.add("5xx")
+                        return self.reply(503, {"status_message": "unavailable"})
+                    return self.reply(*handler(m, query))
+                service.counters.add("404")
+                self.reply(404, {"status_message": "not found"})
+
+            def reply(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items(): self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): pass
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                # Cliente cancelou (Future cancelado no app): esperado, não é erro do benchmark
+                if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)): return
+                super().handle_error(request, client_address)
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"fake-{name}", daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# --- TMDB ---
+def tmdb_service(faults, availability=0.35):
+    template = load_fixture("tmdb_details.json")
+
+    def details(m, query):
+        content_type, cid = m.group(1), int(m.group(2))
+        rng = stable_random("tmdb", content_type, cid)
+        data = copy.deepcopy(template)
+        data["id"] = cid
+        data["title"] = f"{template['title']} {cid}"
+        br = data["watch/providers"]["results"]["BR"]
+        roll = rng.random()
+        # Parte dos títulos está num streaming da lista, parte só para alugar, parte em nenhum lugar
+        if roll < availability: br["flatrate"][0]["provider_name"] = rng.choice(PROVIDERS)
+        elif roll < availability + 0.15: br["flatrate"] = []
+        else: data["watch/providers"]["results"] = {}
+        for v in data["videos"]["results"]: v["key"] = f"{v['key']}{cid}"
+        return 200, data, {}
+
+    def search(m, query):
+        rows = []
+        for k in range(5):
+            rng = stable_random("search", query.get("query"), k)
+            rows.append(dict(load_fixture("match_row.json"), id=rng.randrange(1, 10**6), title=f"{query.get('query')} {k}"))
+        return 200, {"page": 1, "results": rows, "total_pages": 1}, {}
+
+    return FakeHTTPService("tmdb", [
+        (r"/3/(movie|tv)/(\d+)", "details", details),
+        (r"/3/search/(movie|tv)", "search", search),
+    ], faults)
+
+# --- TRAKT ---
+def trakt_service(faults, watched=1500, rated=600):
+    w_template, r_template = load_fixture("trakt_watched.json"), load_fixture("trakt_rating.json")
+    base = datetime(2024, 5, 1)
+
+    def item(template, key, i, **extra):
+        data = copy.deepcopy(template)
+        data[key]["ids"].update(trakt=i, tmdb=i)
+        data[key]["title"] = f"{template[key]['title']} {i}"
+        data.update(extra)
+        return data
+
+    def watched_list(m, query):
+        key = "show" if m.group(2) == "shows" else "movie"
+        w = dict(w_template, **({key: w_template["movie"]} if key == "show" else {}))
+        return 200, [item(w, key, 10**6 + i) for i in range(watched)], {}
+
+    def ratings(m, query):
+        key = "show" if m.group(2) == "shows" else "movie"
+        r = dict(r_template, **({key: r_template["movie"]} if key == "show" else {}))
+        page, limit = int(query.get("page", 1)), int(query.get("limit", rated))
+        start = (page - 1) * limit
+        # Mais recente primeiro, como a API real
+        rows = [item(r, key, 10**6 + i, rating=1 + i % 10, rated_at=(base - timedelta(hours=i)).isoformat() + ".000Z") for i in range(start, min(rated, start + limit))]
+        pages = max(1, -(-rated // limit))
+        return 200, rows, {"X-Pagination-Page": str(page), "X-Pagination-Limit": str(limit), "X-Pagination-Page-Count": str(pages), "X-Pagination-Item-Count": str(rated)}
+
+    def history(m, query):
+        key = "show" if m.group(2) == "shows" else "movie"
+        h = dict(w_template, **({key: w_template["movie"]} if key == "show" else {}))
+        rows = [dict(item(h, key, 10**6), watched_at=base.isoformat() + ".000Z")]
+        return 200, rows, {"X-Pagination-Page-Count": "1", "X-Pagination-Item-Count": "1"}
+
+    return FakeHTTPService("trakt", [
+        (r"/users/([^/]+)/watched/(movies|shows)", "watched", watched_list),
+        (r"/users/([^/]+)/ratings/(movies|shows)", "ratings", ratings),
+        (r"/users/([^/]+)/history/(movies|shows)", "history", history),
+    ], faults)
+
+# --- GEMINI ---
+class FakeResponse:
+    def __init__(self, text): self.text = text
+
+class FakeGenAI:
+    def __init__(self, faults, dims=768):
+        self.faults, self.dims = faults, dims
+        self.counters = Counters()
+
+    def configure(self, **kwargs): pass
+
+    def embed_content(self, model, content, **kwargs):
+        self.counters.add("embed")
+        self.faults.delay()
+        rng = stable_random("embed", model, content)
+        return {"embedding": [rng.gauss(0, 1) for _ in range(self.dims)]}
+
+    def GenerativeModel(self, name):
+        genai = self
+
+        class Model:
+            def generate_content(self, prompt, generation_config=None, **kwargs):
+                genai.counters.add("generate")
+                genai.faults.delay()
+                ids = re.findall(r"ID (\d+)", prompt)
+                if ids and '"score"' in prompt:
+                    return FakeResponse(json.dumps({i: {"score": stable_random("oracle", i).randrange(101), "verdict": "Veredito de benchmark", "reason": "Motivo de benchmark."} for i in ids}))
+                if ids: return FakeResponse(json.dumps({i: "Frase de benchmark sobre o apelo do filme." for i in ids}))
+                return FakeResponse("78\nCombina bastante\nExplicação de benchmark.")
+        return Model()
+
+# --- SUPABASE ---
+class FakeResult:
+    def __init__(self, data): self.data = data
+
+class FakeQuery:
+    # Aceita qualquer cadeia select/eq/in_/order/range/upsert/delete e devolve lista vazia
+    def __init__(self, client, name, data=None):
+        self.client, self.name, self.data = client, name, data or []
+
+    def __getattr__(self, attr):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        self.client.counters.add(self.name)
+        self.client.faults.delay()
+        return FakeResult(self.data)
+
+class FakeSupabase:
+    def __init__(self, faults):
+        self.faults = faults
+        self.counters = Counters()
+        self.row_template = load_fixture("match_row.json")
+
+    def rpc(self, name, params):
+        # Mesmo vetor -> mesmos candidatos (buscas repetidas ficam "quentes" no cache de detalhes)
+        vector = params.get("query_embedding") or []
+        seed = int(hashlib.sha256(repr([round(v, 4) for v in vector[:16]]).encode()).hexdigest()[:8], 16) % 10**4
+        blocked = set(params.get("filter_ids") or [])
+        rng = stable_random("rpc", seed)
+        rows, i = [], 0
+        while len(rows) < params.get("match_count", 60):
+            cid = seed * 1000 + i
+            i += 1
+            if cid in blocked: continue
+            rows.append(dict(self.row_template, id=cid, title=f"{self.row_template['title']} {cid}",
+                             similarity=round(0.9 - len(rows) * 0.004, 4),
+                             vote_average=round(rng.uniform(5.0, 9.0), 1), popularity=round(rng.uniform(5, 900), 1)))
+        return FakeQuery(self, f"rpc:{name}", rows)
+
+    def table(self, name):
+        return FakeQuery(self, f"table:{name}")
@@ -0,0 +1,140 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import concurrent.futures
+
+# ==============================================================================
+# BENCHMARK OFFLINE DOS CAMINHOS QUENTES DO APP
+# Roda o app.py de verdade (modo "bare" do Streamlit) contra TMDB/Trakt/Gemini/
+# Supabase falsos (bench/fakes.py). Nenhuma chave ou rede externa necessária.
+#
+#   python bench/run.py                        # cenário padrão
+#   python bench/run.py --users 8 --searches 40 --throttle-rate 0.05
+#   python bench/run.py --distinct 5           # buscas repetidas (cache quente)
+# ==============================================================================
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fakes
+
+SECRETS = 'TMDB_API_KEY = "bench"\nTRAKT_CLIENT_ID = "bench"\nCACHE_BACKEND = "sqlite"\n'
+
+def load_app(workdir, tmdb, trakt, genai, supabase):
+    # secrets.toml e .cache/ ficam num diretório temporário: nada do ambiente real é tocado
+    os.makedirs(os.path.join(workdir, ".streamlit"), exist_ok=True)
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f: f.write(SECRETS)
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    import app
+    app.get_genai, app.get_supabase = lambda: genai, lambda: supabase
+    app.TMDB_API, app.TRAKT_API = tmdb.base_url + "/3", trakt.base_url
+    return app
+
+def percentile(values, p):
+    if not values: return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def merged_counts(tmdb, trakt, genai, supabase):
+    out = {}
+    for prefix, counters in (("tmdb", tmdb.counters), ("trakt", trakt.counters), ("gemini", genai.counters), ("supabase", supabase.counters)):
+        for k, v in counters.snapshot().items(): out[f"{prefix}.{k}"] = v
+    return out
+
+def diff_counts(after, before):
+    return {k: v - before.get(k, 0) for k, v in after.items() if v - before.get(k, 0)}
+
+def report(title, latencies, counts, runs, wall=None):
+    print(f"\n== {title} ==")
+    print(f"  execuções: {runs}   p50: {percentile(latencies, 50) * 1000:.0f} ms   p95: {percentile(latencies, 95) * 1000:.0f} ms   média: {statistics.mean(latencies) * 1000:.0f} ms")
+    if wall: print(f"  vazão: {runs / wall:.2f} /s ({wall:.2f} s de parede)")
+    for k in sorted(counts): print(f"  {k:<34} {counts[k] / runs:8.1f} por execução")
+
+def run_search(app, prompt, limit, candidates):
+    vector = app.embed_query(prompt)
+    rows = app.match_candidates("match_movies", vector, 0.45, candidates, set())
+    return app.process_batch_parallel(rows, "movie", fakes.PROVIDERS[:3], limit=limit, context_str="Perfil de benchmark", user_query=prompt)
+
+def bench_trakt(app, services, runs):
+    latencies, before = [], merged_counts(*services)
+    for i in range(runs):
+        start = time.perf_counter()
+        app.get_trakt_profile_data(f"bench{i}", "movie")
+        latencies.append(time.perf_counter() - start)
+    report("Trakt: sync completo", latencies, diff_counts(merged_counts(*services), before), runs)
+
+    latencies, before = [], merged_counts(*services)
+    for i in range(runs):
+        start = time.perf_counter()
+        app.get_trakt_profile_data(f"bench{i}", "movie")
+        latencies.append(time.perf_counter() - start)
+    report("Trakt: re-sync sem mudanças", latencies, diff_counts(merged_counts(*services), before), runs)
+
+def bench_search(app, services, args):
+    prompts = [f"Pedido de benchmark número {i % args.distinct}" for i in range(args.searches)]
+    latencies, lock = [], threading.Lock()
+
+    def one(prompt):
+        start = time.perf_counter()
+        results = run_search(app, prompt, args.limit, args.candidates)
+        elapsed = time.perf_counter() - start
+        with lock: latencies.append(elapsed)
+        return len(results)
+
+    before = merged_counts(*services)
+    wall_start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.users) as pool:
+        found = list(pool.map(one, prompts))
+    wall = time.perf_counter() - wall_start
+    title = f"Busca: embed -> RPC -> enriquecimento -> explicações ({args.users} usuário(s) simultâneo(s))"
+    report(title, latencies, diff_counts(merged_counts(*services), before), len(prompts), wall)
+    print(f"  resultados por busca: {statistics.mean(found):.1f} (limit={args.limit})")
+    engine = app.get_http_engine()
+    print(f"  motor TMDB: {engine.stats}  concorrência atual: {engine.limiter.limit:.1f}")
+    print("  etapas (tracing.METRICS):")
+    for m in app.METRICS.snapshot():
+        print(f"    {m['stage']:<16} n={m['count']:<5} média={m['avg_ms']:7.1f} ms  máx={m['max_ms']:7.1f} ms  chamadas={m['calls']:<5} hits={m['hits']:<5} misses={m['misses']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline do CineGourmet")
+    parser.add_argument("--searches", type=int, default=20)
+    parser.add_argument("--users", type=int, default=1, help="usuários simultâneos simulados")
+    parser.add_argument("--distinct", type=int, default=0, help="nº de prompts distintos (0 = todos distintos, cache frio)")
+    parser.add_argument("--candidates", type=int, default=60)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.08, help="latência base dos serviços falsos (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fração de respostas 429")
+    parser.add_argument("--trakt-runs", type=int, default=3)
+    parser.add_argument("--watched", type=int, default=1500)
+    parser.add_argument("--rated", type=int, default=600)
+    args = parser.parse_args(argv)
+    args.distinct = args.distinct or args.searches
+
+    faults = fakes.Faults(args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+    llm_faults = fakes.Faults(args.latency * 4)
+    tmdb = fakes.tmdb_service(faults).start()
+    trakt = fakes.trakt_service(faults, watched=args.watched, rated=args.rated).start()
+    genai, supabase = fakes.FakeGenAI(llm_faults), fakes.FakeSupabase(fakes.Faults(args.latency))
+    services = (tmdb, trakt, genai, supabase)
+
+    with tempfile.TemporaryDirectory(prefix="cinegourmet-bench-") as workdir:
+        app = load_app(workdir, tmdb, trakt, genai, supabase)
+        try:
+            bench_trakt(app, services, args.trakt_runs)
+            bench_search(app, services, args)
+        finally:
+            app.get_http_engine().close()
+            tmdb.stop()
+            trakt.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
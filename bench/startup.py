@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# ==============================================================================
+# BENCHMARK DE PARTIDA DO APP (COLD START + CUSTO POR RERUN)
+# Cada partida a frio é um processo Python novo importando o app.py (modo "bare"
+# do Streamlit); os reruns reexecutam o topo do módulo no mesmo processo, como o
+# Streamlit faz a cada interação. Nenhuma chave ou rede externa necessária.
+#
+#   python bench/startup.py                    # 5 partidas a frio, 20 reruns
+#   python bench/startup.py --cold 10 --reruns 50
+# ==============================================================================
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import SECRETS, percentile
+
+# Módulos caros que não deveriam carregar só por abrir o app
+HEAVY = ["google.generativeai", "supabase", "pandas", "httpx"]
+
+CHILD = """
+import importlib, json, sys, time
+t = time.perf_counter()
+import {module}
+cold = time.perf_counter() - t
+reruns = []
+for _ in range({reruns}):
+    t = time.perf_counter()
+    importlib.reload({module})
+    reruns.append(time.perf_counter() - t)
+print(json.dumps({{"cold": cold, "reruns": reruns, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure(workdir, module, reruns):
+    env = dict(os.environ, PYTHONPATH=ROOT, STREAMLIT_LOGGER_LEVEL="error", PYTHONWARNINGS="ignore")
+    code = CHILD.format(module=module, reruns=reruns, heavy=HEAVY)
+    out = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def report(title, runs):
+    cold = [r["cold"] for r in runs]
+    reruns = [x for r in runs for x in r["reruns"]]
+    print(f"\n== {title} ==")
+    print(f"  partida a frio: p50 {percentile(cold, 50) * 1000:.0f} ms   p95 {percentile(cold, 95) * 1000:.0f} ms   média {statistics.mean(cold) * 1000:.0f} ms")
+    if reruns: print(f"  rerun:          p50 {percentile(reruns, 50) * 1000:.1f} ms   p95 {percentile(reruns, 95) * 1000:.1f} ms")
+    print(f"  módulos pesados carregados: {', '.join(runs[-1]['loaded']) or 'nenhum'}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de partida do CineGourmet")
+    parser.add_argument("--cold", type=int, default=5, help="nº de partidas a frio (processos novos)")
+    parser.add_argument("--reruns", type=int, default=20, help="reruns por partida")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="cinegourmet-startup-") as workdir:
+        # secrets.toml e .cache/ ficam num diretório temporário, como no bench/run.py
+        os.makedirs(os.path.join(workdir, ".streamlit"), exist_ok=True)
+        with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f: f.write(SECRETS)
+        report("Referência: só o streamlit", [measure(workdir, "streamlit", 0) for _ in range(args.cold)])
+        report("app.py", [measure(workdir, "app", args.reruns) for _ in range(args.cold)])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
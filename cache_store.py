@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import concurrent.futures
+
+# ==============================================================================
+# CACHE PERSISTENTE (TMDB / TRAKT / EMBEDDINGS)
+# Sobrevive a restarts e é compartilhado entre réplicas/processos.
+# Backends: SQLite local (padrão) ou tabela no Supabase.
+# ==============================================================================
+
+# TTL "fresco" por namespace (segundos). Depois disso o valor ainda é servido
+# por até STALE_FACTOR * TTL enquanto é revalidado em segundo plano.
+DEFAULT_TTLS = {
+    "tmdb_details": 86400,
+    "tmdb_search": 3600,
+    "trakt_snapshot": 365 * 86400,
+    "embedding": 30 * 86400,
+    "oracle": 7 * 86400,
+    "taste_profile": 365 * 86400,
+    "precomputed": 86400,
+}
+STALE_FACTOR = 7
+# Exceções ao STALE_FACTOR: o app não revalida vereditos do Oráculo, então "stale" seria servido por semanas
+STALE_FACTORS = {"oracle": 1}
+# Estado por usuário, regravado só quando muda: fica fora da poda LRU (cresce com o nº de usuários,
+# não com o tráfego) para o churn do TMDB não derrubar o snapshot de quem tem perfil estável
+PINNED_NAMESPACES = ("trakt_snapshot", "taste_profile")
+# Supabase: accessed_at só é regravado se tiver mais que isso (LRU aproximado sem um UPDATE por leitura)
+TOUCH_INTERVAL = 86400
+
+def hashable_key(key):
+    # Chaves podem chegar como lista (ex.: [usuario, tipo]); no dict de retorno viram tupla
+    return tuple(key) if isinstance(key, list) else key
+
+def encode_key(key):
+    return json.dumps(key if isinstance(key, (list, tuple)) else [key], separators=(",", ":"), ensure_ascii=False)
+
+class SQLiteBackend:
+    def __init__(self, path=".cache/cinegourmet.sqlite", max_entries=50000, pinned=PINNED_NAMESPACES):
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.pinned = list(pinned)
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS api_cache (
+            namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,
+            stored_at REAL NOT NULL, accessed_at REAL NOT NULL,
+            PRIMARY KEY (namespace, key))""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS api_cache_lru ON api_cache (accessed_at)")
+        self.conn.commit()
+
+    def get_many(self, namespace, keys):
+        if not keys: return {}
+        now, out = time.time(), {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self.conn.execute(f"SELECT key, value, stored_at FROM api_cache WHERE namespace = ? AND key IN ({marks})", [namespace, *chunk]).fetchall()
+                for key, value, stored_at in rows: out[key] = (json.loads(value), stored_at)
+                if rows: self.conn.execute(f"UPDATE api_cache SET accessed_at = ? WHERE namespace = ? AND key IN ({marks})", [now, namespace, *chunk])
+            self.conn.commit()
+        return out
+
+    def set_many(self, namespace, entries):
+        now = time.time()
+        rows = [(namespace, key, json.dumps(value, ensure_ascii=False).encode("utf-8"), now, now) for key, value in entries.items()]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO api_cache VALUES (?, ?, ?, ?, ?)", rows)
+            self.writes += len(rows)
+            # LRU: poda a cada ~200 escritas para não contar a tabela em todo insert
+            if self.writes >= 200:
+                self.writes = 0
+                marks = ",".join("?" * len(self.pinned))
+                excess = self.conn.execute(f"SELECT COUNT(*) FROM api_cache WHERE namespace NOT IN ({marks})", self.pinned).fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self.conn.execute(f"DELETE FROM api_cache WHERE rowid IN (SELECT rowid FROM api_cache WHERE namespace NOT IN ({marks}) ORDER BY accessed_at LIMIT ?)", [*self.pinned, excess])
+            self.conn.commit()
+
+    def delete(self, namespace, keys):
+        with self.lock:
+            self.conn.executemany("DELETE FROM api_cache WHERE namespace = ? AND key = ?", [(namespace, k) for k in keys])
+            self.conn.commit()
+
+class SupabaseBackend:
+    # Tabela e poda: sql/api_cache.sql. A chave vai como hash hexadecimal: o JSON da chave
+    # (aspas, vírgulas, colchetes) quebra o filtro in_() do PostgREST.
+    def __init__(self, client, table="api_cache", max_entries=200000, pinned=PINNED_NAMESPACES):
+        self.client = client
+        self.table = table
+        self.max_entries = max_entries
+        self.pinned = list(pinned)
+        self.writes = 0
+
+    @staticmethod
+    def row_key(key):
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get_many(self, namespace, keys):
+        if not keys: return {}
+        hashed = {self.row_key(k): k for k in keys}
+        ids, out, touch, now = list(hashed), {}, [], time.time()
+        try:
+            for start in range(0, len(ids), 200):
+                rows = self.client.table(self.table).select("key, value, stored_at, accessed_at").eq("namespace", namespace).in_("key", ids[start:start + 200]).execute().data
+                for r in rows:
+                    if r["key"] not in hashed: continue
+                    out[hashed[r["key"]]] = (r["value"], r["stored_at"])
+                    if now - (r.get("accessed_at") or 0) > TOUCH_INTERVAL: touch.append(r["key"])
+            if touch: self.client.table(self.table).update({"accessed_at": now}).eq("namespace", namespace).in_("key", touch).execute()
+        except: pass
+        return out
+
+    def set_many(self, namespace, entries):
+        now = time.time()
+        rows = [{"namespace": namespace, "key": self.row_key(k), "value": v, "stored_at": now, "accessed_at": now} for k, v in entries.items()]
+        try:
+            self.client.table(self.table).upsert(rows).execute()
+            self.writes += len(rows)
+            if self.writes >= 1000:
+                self.writes = 0
+                # Poda LRU num único DELETE no banco, sem tocar nos namespaces fixos
+                self.client.rpc("prune_api_cache", {"max_entries": self.max_entries, "pinned": self.pinned}).execute()
+        except: pass
+
+    def delete(self, namespace, keys):
+        try: self.client.table(self.table).delete().eq("namespace", namespace).in_("key", [self.row_key(k) for k in keys]).execute()
+        except: pass
+
+class PersistentCache:
+    def __init__(self, backend, ttls=None, stale_factor=STALE_FACTOR, stale_factors=None):
+        self.backend = backend
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stale_factor = stale_factor
+        self.stale_factors = dict(STALE_FACTORS, **(stale_factors or {}))
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.inflight = set()
+        self.refresher = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+    def _count(self, namespace, kind, n=1):
+        with self.lock:
+            ns = self.stats.setdefault(namespace, {"hits": 0, "stale": 0, "misses": 0})
+            ns[kind] += n
+
+    def get_many(self, namespace, keys):
+        # Devolve {key: (valor, "fresh"|"stale")}; chaves ausentes/expiradas ficam de fora
+        encoded = {encode_key(k): hashable_key(k) for k in keys}
+        rows = self.backend.get_many(namespace, list(encoded))
+        ttl, now, out, dead = self.ttls.get(namespace, 3600), time.time(), {}, []
+        stale_factor = self.stale_factors.get(namespace, self.stale_factor)
+        for ek, key in encoded.items():
+            if ek not in rows: continue
+            value, stored_at = rows[ek]
+            age = now - stored_at
+            if age <= ttl: out[key] = (value, "fresh")
+            elif age <= ttl * stale_factor: out[key] = (value, "stale")
+            else: dead.append(ek)
+        if dead: self.backend.delete(namespace, dead)
+        fresh = sum(1 for v in out.values() if v[1] == "fresh")
+        self._count(namespace, "hits", fresh)
+        self._count(namespace, "stale", len(out) - fresh)
+        self._count(namespace, "misses", len(encoded) - len(out))
+        return out
+
+    def set_many(self, namespace, entries):
+        if entries: self.backend.set_many(namespace, {encode_key(k): v for k, v in entries.items()})
+
+    def get(self, namespace, key):
+        hit = self.get_many(namespace, [key]).get(hashable_key(key))
+        return hit if hit else (None, None)
+
+    def set(self, namespace, key, value):
+        self.backend.set_many(namespace, {encode_key(key): value})
+
+    def revalidate(self, namespace, key, loader):
+        # Stale-while-revalidate: uma única revalidação em voo por chave
+        token = (namespace, encode_key(key))
+        with self.lock:
+            if token in self.inflight: return
+            self.inflight.add(token)
+        def job():
+            try:
+                value = loader()
+                if value is not None: self.set(namespace, key, value)
+            finally:
+                with self.lock: self.inflight.discard(token)
+        self.refresher.submit(job)
+
+    def fetch(self, namespace, key, loader):
+        value, state = self.get(namespace, key)
+        if state == "stale": self.revalidate(namespace, key, loader)
+        if state: return value
+        value = loader()
+        if value is not None: self.set(namespace, key, value)
+        return value
+
+def build_cache(kind="sqlite", supabase_client=None, path=".cache/cinegourmet.sqlite", ttls=None):
+    if kind == "supabase" and supabase_client is not None: backend = SupabaseBackend(supabase_client)
+    else: backend = SQLiteBackend(path)
+    return PersistentCache(backend, ttls)
@@ -0,0 +1,144 @@
+import asyncio
+import random
+import threading
+import time
+import concurrent.futures
+import httpx
+
+# ==============================================================================
+# MOTOR HTTP ASSÍNCRONO (TMDB)
+# Loop asyncio próprio numa thread de fundo: o script síncrono do Streamlit
+# envia corrotinas e recebe concurrent.futures.Future de volta.
+# ==============================================================================
+
+# TMDB: ~50 req/s por IP e ~20 conexões simultâneas. Ficamos um pouco abaixo.
+TMDB_RATE = 40
+TMDB_BURST = 40
+TMDB_MAX_CONCURRENCY = 20
+# Trakt: 1000 GETs a cada 5 min por app
+TRAKT_RATE = 3
+TRAKT_BURST = 10
+TRAKT_MAX_CONCURRENCY = 4
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def penalize(self, seconds):
+        # 429: esvazia o balde para que TODAS as requisições esperem o Retry-After
+        # (não acumula: vários 429 seguidos pedem a mesma espera, não a soma delas)
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+class AdaptiveLimiter:
+    # AIMD: +1 de concorrência por "janela" de sucessos, metade em 429/5xx
+    def __init__(self, initial, minimum, maximum):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self):
+        self.limit = max(self.minimum, self.limit / 2)
+
+class AsyncHTTPEngine:
+    def __init__(self, rate=TMDB_RATE, burst=TMDB_BURST, max_concurrency=TMDB_MAX_CONCURRENCY, min_concurrency=2, timeout=5.0, retries=3):
+        self.rate, self.burst = rate, burst
+        self.max_concurrency, self.min_concurrency = max_concurrency, min_concurrency
+        self.timeout, self.retries = timeout, retries
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="http-engine", daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self.loop).result()
+
+    async def _setup(self):
+        # Keep-alive: pool do tamanho da concorrência máxima
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        self.client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        self.bucket = TokenBucket(self.rate, self.burst)
+        self.limiter = AdaptiveLimiter(max(self.min_concurrency, self.max_concurrency // 2), self.min_concurrency, self.max_concurrency)
+
+    def _backoff(self, attempt, response):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        try: return float(retry_after)
+        except (TypeError, ValueError): return 0.5 * (2 ** attempt) * (1 + random.random() / 2)
+
+    async def fetch_json(self, url, params=None, headers=None):
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            response = None
+            async with self.limiter:
+                self.stats["requests"] += 1
+                try: response = await self.client.get(url, params=params, headers=headers)
+                except httpx.TransportError: self.stats["errors"] += 1
+
+            if response is not None and response.status_code < 400:
+                self.limiter.on_success()
+                try: return response.json()
+                except ValueError: return None
+            if response is not None and response.status_code != 429 and response.status_code < 500:
+                return None
+
+            # 429 / 5xx / erro de rede: reduz concorrência e espera antes de tentar de novo
+            self.limiter.on_throttle()
+            delay = self._backoff(attempt, response)
+            if response is not None and response.status_code == 429:
+                # A espera fica só no balde: a nova tentativa aguarda no acquire() junto com as demais
+                self.stats["throttled"] += 1
+                self.bucket.penalize(delay)
+            elif attempt < self.retries: await asyncio.sleep(delay)
+        return None
+
+    def submit(self, url, params=None, headers=None):
+        return asyncio.run_coroutine_threadsafe(self.fetch_json(url, params, headers), self.loop)
+
+    def get_json(self, url, params=None, headers=None, timeout=None):
+        future = self.submit(url, params, headers)
+        try: return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return None
+
+    def get_many(self, reqs, timeout=None):
+        # reqs: lista de (url, params[, headers]). Devolve os JSONs na mesma ordem (None em falha).
+        futures = [self.submit(*req) for req in reqs]
+        done, pending = concurrent.futures.wait(futures, timeout=timeout)
+        for f in pending: f.cancel()
+        return [f.result() if f in done and not f.cancelled() and f.exception() is None else None for f in futures]
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
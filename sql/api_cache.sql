@@ -0,0 +1,26 @@
+-- ==============================================================================
+-- CACHE PERSISTENTE COMPARTILHADO (CACHE_BACKEND = "supabase")
+-- Mesmo papel do .cache/cinegourmet.sqlite, mas visível a todas as réplicas.
+-- key é o sha1 (hex) da chave JSON; ver SupabaseBackend em cache_store.py.
+-- ==============================================================================
+
+create table if not exists api_cache (
+    namespace text not null,             -- 'tmdb_details' | 'tmdb_search' | 'embedding' | ...
+    key text not null,
+    value jsonb not null,
+    stored_at float8 not null,           -- epoch (s) da última gravação
+    accessed_at float8 not null,         -- epoch (s) do último acesso, regravado no máximo 1x/dia por linha
+    primary key (namespace, key)
+);
+
+create index if not exists api_cache_lru on api_cache (accessed_at);
+
+-- Poda LRU chamada pelo app a cada ~1000 gravações: fora os namespaces fixos (estado por
+-- usuário, ver PINNED_NAMESPACES), apaga tudo além das max_entries acessadas mais recentemente
+create or replace function prune_api_cache(max_entries int, pinned text[])
+returns void language sql as $$
+    delete from api_cache c
+    using (select namespace, key from api_cache where namespace <> all(pinned)
+           order by accessed_at desc offset max_entries) old
+    where c.namespace = old.namespace and c.key = old.key;
+$$;
@@ -0,0 +1,18 @@
+-- ==============================================================================
+-- ÍNDICE DE DISPONIBILIDADE POR TÍTULO (provedores de streaming por região)
+-- Regravado pelo job periódico: python availability_index.py refresh
+-- service_mask: bits 0-5 = Netflix, Amazon Prime Video, Disney Plus, Max,
+-- Apple TV Plus, Globoplay (availability_index.SERVICES); bit 7 = tem aluguel.
+-- ==============================================================================
+
+create table if not exists content_availability (
+    content_id bigint not null,
+    content_type text not null,          -- 'movie' | 'tv'
+    region text not null default 'BR',
+    provider_ids int[] not null default '{}',
+    service_mask smallint not null default 0,
+    updated_at timestamptz not null default now(),
+    primary key (content_id, content_type, region)
+);
+
+create index if not exists content_availability_pull on content_availability (content_type, region, content_id);
@@ -0,0 +1,37 @@
+-- ==============================================================================
+-- CONJUNTO DE EXCLUSÃO POR USUÁRIO (vistos no Trakt + "Nunca Mais")
+-- Gravado no "Sincronizar" e incrementado a cada bloqueio; as funções
+-- *_for_user fazem o anti-join no banco em vez de receber filter_ids.
+-- ==============================================================================
+
+create table if not exists user_exclusions (
+    trakt_username text not null,
+    content_type text not null,          -- 'movie' | 'tv'
+    content_id bigint not null,
+    primary key (trakt_username, content_type, content_id)
+);
+
+-- Devolve as mesmas colunas de match_movies (linha da tabela sem o embedding + similarity)
+create or replace function match_movies_for_user(query_embedding vector(768), match_threshold float, match_count int, p_username text)
+returns setof jsonb language sql stable as $$
+    select (to_jsonb(m) - 'embedding') || jsonb_build_object('similarity', 1 - (m.embedding <=> query_embedding))
+    from movies m
+    where 1 - (m.embedding <=> query_embedding) > match_threshold
+      and not exists (
+          select 1 from user_exclusions e
+          where e.trakt_username = p_username and e.content_type = 'movie' and e.content_id = m.id)
+    order by m.embedding <=> query_embedding
+    limit match_count;
+$$;
+
+create or replace function match_tv_shows_for_user(query_embedding vector(768), match_threshold float, match_count int, p_username text)
+returns setof jsonb language sql stable as $$
+    select (to_jsonb(t) - 'embedding') || jsonb_build_object('similarity', 1 - (t.embedding <=> query_embedding))
+    from tv_shows t
+    where 1 - (t.embedding <=> query_embedding) > match_threshold
+      and not exists (
+          select 1 from user_exclusions e
+          where e.trakt_username = p_username and e.content_type = 'tv' and e.content_id = t.id)
+    order by t.embedding <=> query_embedding
+    limit match_count;
+$$;
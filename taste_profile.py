@@ -0,0 +1,69 @@
+import base64
+import numpy as np
+
+# ==============================================================================
+# PERFIL DE GOSTO VETORIAL
+# Soma ponderada dos embeddings (normalizados) dos títulos avaliados no Trakt:
+#   nota >= 7 -> peso positivo (7: +1 ... 10: +4)
+#   nota <= 5 -> peso negativo (5: -1 ... 1: -5); nota 6 não conta
+# Guarda a soma + o peso aplicado por id: um re-sync só soma a diferença das
+# notas novas/alteradas/removidas, sem reler o histórico inteiro.
+# ==============================================================================
+
+POSITIVE_MIN = 7
+NEGATIVE_MAX = 5
+BLEND_ALPHA = 0.6  # peso do pedido do usuário na mistura com o perfil
+
+def rating_weight(rating):
+    if rating >= POSITIVE_MIN: return float(rating - POSITIVE_MIN + 1)
+    if rating <= NEGATIVE_MAX: return -float(NEGATIVE_MAX - rating + 1)
+    return 0.0
+
+def normalize(vector):
+    v = np.asarray(vector, dtype=np.float32)
+    return v / (np.linalg.norm(v) or 1.0)
+
+class TasteProfile:
+    def __init__(self, total=None, weights=None):
+        self.total = total
+        self.weights = weights or {}
+
+    @classmethod
+    def from_json(cls, data):
+        if not data: return cls()
+        total = np.frombuffer(base64.b64decode(data["total"]), dtype=np.float32).copy() if data.get("total") else None
+        return cls(total, {int(k): float(w) for k, w in data.get("weights", {}).items()})
+
+    def to_json(self):
+        total = base64.b64encode(self.total.tobytes()).decode("ascii") if self.total is not None else None
+        return {"total": total, "weights": {str(k): w for k, w in self.weights.items()}}
+
+    def update(self, ratings, vectors_for):
+        # ratings: {id: nota}; vectors_for(ids) -> {id: vetor} só dos que existem no catálogo.
+        # Devolve quantos ids mudaram de peso. Título fora do catálogo não entra (tenta de novo no próximo sync).
+        targets = {int(cid): rating_weight(r) for cid, r in ratings.items()}
+        deltas = {cid: w - self.weights.get(cid, 0.0) for cid, w in targets.items()}
+        deltas.update({cid: -w for cid, w in self.weights.items() if cid not in targets})
+        deltas = {cid: d for cid, d in deltas.items() if d}
+        if not deltas: return 0
+        vectors = vectors_for(list(deltas))
+        changed = 0
+        for cid, delta in deltas.items():
+            if cid not in vectors: continue
+            v = normalize(vectors[cid])
+            self.total = v * delta if self.total is None else self.total + v * delta
+            weight = targets.get(cid, 0.0)
+            if weight: self.weights[cid] = weight
+            else: self.weights.pop(cid, None)
+            changed += 1
+        return changed
+
+    def vector(self):
+        # Direção do gosto (normalizada); None sem notas suficientes
+        if self.total is None or not self.weights or not np.linalg.norm(self.total): return None
+        return normalize(self.total)
+
+def blend(query_vector, taste_vector, alpha=BLEND_ALPHA):
+    # Pedido e perfil com o mesmo "tamanho" antes de misturar; sem perfil, fica só o pedido
+    if taste_vector is None: return np.asarray(query_vector, dtype=np.float32)
+    return normalize(alpha * normalize(query_vector) + (1 - alpha) * normalize(taste_vector))
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+# app.py é um script do Streamlit: importá-lo (modo "bare") roda a página inteira uma vez.
+# secrets.toml e .cache/ ficam num diretório temporário, como em bench/run.py.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRETS = 'TMDB_API_KEY = "test"\nTRAKT_CLIENT_ID = "test"\nCACHE_BACKEND = "sqlite"\n'
+
+def load_app():
+    if "app" in sys.modules: return sys.modules["app"]
+    workdir = tempfile.mkdtemp(prefix="cinegourmet-test-")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f: f.write(SECRETS)
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    os.chdir(workdir)
+    if ROOT not in sys.path: sys.path.insert(0, ROOT)
+    import app
+    return app
@@ -0,0 +1,131 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache_store import build_cache, encode_key, PersistentCache, SQLiteBackend, SupabaseBackend, TOUCH_INTERVAL
+
+class PersistentCacheKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = build_cache("sqlite", path=os.path.join(self.tmp.name, "cache.sqlite"))
+
+    def tearDown(self):
+        self.cache.refresher.shutdown(wait=True)
+        self.cache.backend.conn.close()
+        self.tmp.cleanup()
+
+    def test_list_key_roundtrip(self):
+        self.cache.set("tmdb_details", ["movie", 603], {"trailer": None})
+        self.assertEqual(self.cache.get("tmdb_details", ["movie", 603]), ({"trailer": None}, "fresh"))
+
+    def test_list_and_tuple_keys_are_the_same_entry(self):
+        self.cache.set("tmdb_details", ("movie", 603), 1)
+        self.assertEqual(self.cache.get("tmdb_details", ["movie", 603])[0], 1)
+        hits = self.cache.get_many("tmdb_details", [["movie", 603], ("movie", 604)])
+        self.assertEqual(hits, {("movie", 603): (1, "fresh")})
+
+    def test_fetch_with_list_key(self):
+        calls = []
+        loader = lambda: calls.append(1) or {"ratings": {}}
+        self.assertEqual(self.cache.fetch("tmdb_search", ["bob", "movie"], loader), {"ratings": {}})
+        self.assertEqual(self.cache.fetch("tmdb_search", ["bob", "movie"], loader), {"ratings": {}})
+        self.assertEqual(len(calls), 1)
+
+class SQLitePruneTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = SQLiteBackend(os.path.join(self.tmp.name, "cache.sqlite"), max_entries=100)
+        self.cache = PersistentCache(self.backend)
+
+    def tearDown(self):
+        self.cache.refresher.shutdown(wait=True)
+        self.backend.conn.close()
+        self.tmp.cleanup()
+
+    def test_tmdb_churn_does_not_evict_user_state(self):
+        self.cache.set("trakt_snapshot", ["bob", "movie"], {"ratings": {}})
+        self.cache.set("taste_profile", ["bob", "movie"], {"total": None})
+        for start in range(0, 600, 50):
+            self.cache.set_many("tmdb_details", {("movie", i): {} for i in range(start, start + 50)})
+        self.assertEqual(self.cache.get("trakt_snapshot", ["bob", "movie"])[1], "fresh")
+        self.assertEqual(self.cache.get("taste_profile", ["bob", "movie"])[1], "fresh")
+        count = self.backend.conn.execute("SELECT COUNT(*) FROM api_cache WHERE namespace = 'tmdb_details'").fetchone()[0]
+        self.assertLessEqual(count, 100 + 200)
+
+    def test_oracle_has_no_stale_window(self):
+        # Os dois com o dobro do TTL: tmdb_search ainda é servido como stale, o veredito do Oráculo expira
+        self.cache.set("oracle", ["p", "movie", 1], {"verdict": "ok"})
+        self.cache.set("tmdb_search", ["q", "movie"], [])
+        for namespace in ("oracle", "tmdb_search"):
+            self.backend.conn.execute("UPDATE api_cache SET stored_at = ? WHERE namespace = ?", (time.time() - 2 * self.cache.ttls[namespace], namespace))
+        self.assertEqual(self.cache.get("oracle", ["p", "movie", 1]), (None, None))
+        self.assertEqual(self.cache.get("tmdb_search", ["q", "movie"]), ([], "stale"))
+
+class FakeTable:
+    # Só o pedaço do query builder do PostgREST que o SupabaseBackend usa
+    def __init__(self, rows, op="select", payload=None):
+        self.rows, self.op, self.payload, self.filters = rows, op, payload, []
+
+    def select(self, columns): return self
+    def upsert(self, rows): return FakeTable(self.rows, "upsert", rows)
+    def delete(self): return FakeTable(self.rows, "delete")
+    def update(self, values): return FakeTable(self.rows, "update", values)
+    def eq(self, column, value): return self._filter(column, [value])
+    def in_(self, column, values): return self._filter(column, values)
+
+    def _filter(self, column, values):
+        # Valores de in_() com vírgula/aspas/parênteses precisariam de escape no PostgREST
+        assert all(not any(c in str(v) for c in ',"()[]') for v in values), values
+        self.filters.append((column, set(values)))
+        return self
+
+    def _matches(self, row): return all(row[c] in vs for c, vs in self.filters)
+
+    def execute(self):
+        if self.op == "upsert":
+            for r in self.payload: self.rows[(r["namespace"], r["key"])] = dict(r)
+        elif self.op == "update":
+            for r in self.rows.values():
+                if self._matches(r): r.update(self.payload)
+        elif self.op == "delete":
+            for k in [k for k, r in self.rows.items() if self._matches(r)]: del self.rows[k]
+        return type("Result", (), {"data": [r for r in self.rows.values() if self._matches(r)] if self.op == "select" else []})
+
+class FakeSupabase:
+    def __init__(self): self.rows = {}
+    def table(self, name): return FakeTable(self.rows)
+
+class SupabaseBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeSupabase()
+        self.cache = PersistentCache(SupabaseBackend(self.client))
+
+    def tearDown(self):
+        self.cache.refresher.shutdown(wait=True)
+
+    def test_json_keys_roundtrip_as_plain_hex(self):
+        self.cache.set_many("tmdb_search", {("bob", "a, b (2020)"): [1], ("bob", "movie"): [2]})
+        self.assertTrue(all(k.isalnum() for _, k in self.client.rows))
+        hits = self.cache.get_many("tmdb_search", [["bob", "a, b (2020)"], ("bob", "movie"), ("bob", "tv")])
+        self.assertEqual(hits, {("bob", "a, b (2020)"): ([1], "fresh"), ("bob", "movie"): ([2], "fresh")})
+
+    def test_reads_touch_accessed_at_at_most_once_per_interval(self):
+        self.cache.set("tmdb_details", ("movie", 603), 1)
+        row = next(iter(self.client.rows.values()))
+        row["accessed_at"] = time.time() - TOUCH_INTERVAL - 1
+        self.cache.get("tmdb_details", ("movie", 603))
+        touched = row["accessed_at"]
+        self.assertGreater(touched, time.time() - 5)
+        self.cache.get("tmdb_details", ("movie", 603))
+        self.assertEqual(row["accessed_at"], touched)
+
+    def test_delete_uses_hashed_keys(self):
+        self.cache.set("oracle", ("movie", 603), "ok")
+        self.cache.backend.delete("oracle", [encode_key(("movie", 603))])
+        self.assertEqual(self.client.rows, {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import concurrent.futures
+import random
+import unittest
+from unittest import mock
+
+from app_loader import load_app
+
+app = load_app()
+
+SERVICE = "Netflix"
+
+def details_for(available):
+    flat = [{"provider_name": SERVICE}] if available else []
+    return {"available": available, "flat": flat, "rent": [], "trailer": None, "info": {}}
+
+class FakeTMDB:
+    # Parte dos ids vem do cache (de uma vez, na onda); o resto chega por Futures já resolvidos
+    def __init__(self, available, cached):
+        self.available, self.cached = available, cached
+
+    def lookup(self, content_ids, content_type):
+        return {cid: details_for(cid in self.available) for cid in content_ids if cid in self.cached}, [cid for cid in content_ids if cid not in self.cached]
+
+    def submit(self, content_ids, content_type):
+        futures = {}
+        for cid in content_ids:
+            f = concurrent.futures.Future()
+            f.set_result(cid)
+            futures[f] = cid
+        return futures
+
+    def store(self, content_id, content_type, data):
+        self.cached.add(content_id)
+        return details_for(content_id in self.available)
+
+class CandidatePoolTest(unittest.TestCase):
+    def assert_pages(self, n, available, cached, limits):
+        # Mesmo pool avançado com limits crescentes, como a página faz entre reruns
+        tmdb = FakeTMDB(set(available), set(cached))
+        ranked = [{"id": i, "rank": i, "title": str(i)} for i in range(n)]
+        pool = {"ranked": ranked, "cursor": 0, "pending": [], "results": [], "api_type": "movie", "my_services": [SERVICE],
+                "context_str": None, "user_query": None}
+        expected = sorted(available)
+        with mock.patch.multiple(app, lookup_tmdb_details=tmdb.lookup, submit_tmdb_details=tmdb.submit, store_tmdb_details=tmdb.store):
+            for limit in limits:
+                self.assertEqual([i["id"] for i in app.advance_pool(pool, limit)], expected[:limit], f"limit={limit}")
+        return pool
+
+    def test_deferred_item_enters_later_page(self):
+        # Onda 1 (ids 0-20): tudo em cache menos o 12, que é adiado pelo corte antecipado.
+        # Com limit 13 ele precisa aparecer antes do 13, que já estava em pool['results'].
+        pool = self.assert_pages(60, range(60), set(range(60)) - {12}, [10, 11, 13, 14, 24])
+        self.assertFalse(pool["pending"])
+
+    def test_growing_limits_match_rank_order(self):
+        # "Nunca Mais" (+1) e "Mais resultados" (+10) contra a lista ideal: disponíveis em ordem de rank
+        for seed in range(60):
+            rng = random.Random(seed)
+            n = 80
+            available = [i for i in range(n) if rng.random() < 0.6]
+            cached = [i for i in range(n) if rng.random() < 0.5]
+            with self.subTest(seed=seed): self.assert_pages(n, available, cached, [10, 11, 12, 22, 23, 33, 60])
+
+if __name__ == "__main__":
+    unittest.main()
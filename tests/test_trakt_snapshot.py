@@ -0,0 +1,118 @@
+import unittest
+from unittest import mock
+
+from app_loader import load_app
+
+app = load_app()
+
+USER = "bob"
+
+class FakeResponse:
+    def __init__(self, data, headers=None): self.data, self.headers = data, headers or {}
+    def json(self): return list(self.data) if isinstance(self.data, list) else self.data
+
+class FakeTraktAccount:
+    # Conta mutável: plays no histórico e notas, com os headers de paginação da API real
+    def __init__(self, plays, ratings):
+        self.clock = 0
+        self.plays = [(cid, self.tick()) for cid in plays]
+        self.ratings = {cid: (rating, self.tick()) for cid, rating in ratings.items()}
+        self.activity = {"watched_at": self.tick(), "rated_at": self.tick()}
+        self.calls = []
+
+    def tick(self):
+        self.clock += 1
+        return f"2026-01-01T00:{self.clock // 60:02d}:{self.clock % 60:02d}.000Z"
+
+    def play(self, cid): self.plays.append((cid, self.tick())); self.activity["watched_at"] = self.tick()
+    def unplay(self, cid): self.plays = [p for p in self.plays if p[0] != cid]; self.activity["watched_at"] = self.tick()
+    def rate(self, cid, rating): self.ratings[cid] = (rating, self.tick()); self.activity["rated_at"] = self.tick()
+    def unrate(self, cid): del self.ratings[cid]; self.activity["rated_at"] = self.tick()
+
+    def page(self, rows, params):
+        limit, page = int(params.get("limit", 10)), int(params.get("page", 1))
+        headers = {"X-Pagination-Page-Count": str(max(1, -(-len(rows) // limit))), "X-Pagination-Item-Count": str(len(rows))}
+        return FakeResponse(rows[(page - 1) * limit:page * limit], headers)
+
+    def get(self, path, params=None):
+        params = params or {}
+        self.calls.append(path)
+        movie = lambda cid: {"title": f"Filme {cid}", "ids": {"tmdb": cid}}
+        if path == "/sync/last_activities": return FakeResponse({"movies": dict(self.activity)})
+        if path == f"/users/{USER}/watched/movies":
+            return FakeResponse([{"movie": movie(cid)} for cid in dict.fromkeys(cid for cid, _ in self.plays)])
+        if path == f"/users/{USER}/history/movies":
+            rows = [{"movie": movie(cid), "watched_at": at} for cid, at in sorted(self.plays, key=lambda p: p[1], reverse=True)]
+            return self.page([r for r in rows if r["watched_at"] >= params.get("start_at", "")], params)
+        if path == f"/users/{USER}/ratings/movies":
+            rows = [{"movie": movie(cid), "rating": r, "rated_at": at} for cid, (r, at) in sorted(self.ratings.items(), key=lambda x: x[1][1], reverse=True)]
+            return self.page(rows, params)
+        return None
+
+class TraktSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.account = FakeTraktAccount(plays=[1, 2, 3, 4, 5, 6], ratings={1: 9, 2: 8, 6: 3})
+
+    def sync(self, snapshot=None, token=False):
+        with mock.patch.multiple(app, trakt_get=self.account.get, TRAKT_ACCESS_TOKEN="t" if token else "", TRAKT_TOKEN_USER=USER):
+            snap = app.fetch_trakt_snapshot(USER, "movie", snapshot)
+        self.assertIsNotNone(snap)
+        return snap
+
+    def assert_matches_full_sync(self, snap, token=False):
+        full = self.sync(token=token)
+        self.assertEqual(snap["ratings"], full["ratings"])
+        self.assertEqual(set(snap["watched_ids"]), set(full["watched_ids"]))
+
+    def test_new_rating_uses_delta(self):
+        snap = self.sync()
+        self.account.rate(3, 10)
+        self.account.calls.clear()
+        snap = self.sync(snap)
+        self.assertIn("3", snap["ratings"])
+        self.assertNotIn(f"/users/{USER}/watched/movies", self.account.calls)
+        self.assertEqual(self.account.calls.count(f"/users/{USER}/ratings/movies"), 2)  # marcador + delta
+        self.assert_matches_full_sync(snap)
+
+    def test_removed_rating(self):
+        for token in (False, True):
+            with self.subTest(token=token):
+                self.setUp()
+                snap = self.sync(token=token)
+                self.account.unrate(6)
+                self.assert_matches_full_sync(self.sync(snap, token), token)
+
+    def test_removed_and_added_rating(self):
+        # Mesma contagem de notas antes e depois: só o total do header não denuncia a remoção
+        for token in (False, True):
+            with self.subTest(token=token):
+                self.setUp()
+                snap = self.sync(token=token)
+                self.account.unrate(6)
+                self.account.rate(4, 7)
+                snap = self.sync(snap, token)
+                self.assertNotIn("6", snap["ratings"])
+                self.assert_matches_full_sync(snap, token)
+
+    def test_removed_and_added_play(self):
+        for token in (False, True):
+            with self.subTest(token=token):
+                self.setUp()
+                snap = self.sync(token=token)
+                self.account.unplay(5)
+                self.account.play(7)
+                snap = self.sync(snap, token)
+                self.assertNotIn(5, snap["watched_ids"])
+                self.assert_matches_full_sync(snap, token)
+
+    def test_new_play_uses_delta(self):
+        snap = self.sync()
+        self.account.play(7)
+        self.account.calls.clear()
+        snap = self.sync(snap)
+        self.assertIn(7, snap["watched_ids"])
+        self.assertNotIn(f"/users/{USER}/watched/movies", self.account.calls)
+        self.assert_matches_full_sync(snap)
+
+if __name__ == "__main__":
+    unittest.main()
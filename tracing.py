@@ -0,0 +1,108 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# ==============================================================================
+# INSTRUMENTAÇÃO POR ETAPA (embed, RPC, TMDB, LLM, dashboards)
+# Cada busca abre um trace; as etapas registram tempo, chamadas externas,
+# hits/misses de cache e bytes enviados. Ao fechar: 1 linha JSON no log
+# "cinegourmet.trace" + agregado em METRICS (painel de debug / export).
+# ==============================================================================
+
+logger = logging.getLogger("cinegourmet.trace")
+_current = contextvars.ContextVar("cinegourmet_trace", default=None)
+COUNTERS = ("calls", "hits", "misses", "bytes")
+
+class Span:
+    def __init__(self, name):
+        self.name = name
+        self.ms = 0.0
+        self.counts = dict.fromkeys(COUNTERS, 0)
+
+    def add(self, **counts):
+        for k, v in counts.items(): self.counts[k] = self.counts.get(k, 0) + v
+
+    def as_dict(self):
+        return {"stage": self.name, "ms": round(self.ms, 1), **self.counts}
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+
+    def summary(self):
+        # Etapas com o mesmo nome (ex.: várias ondas de TMDB) são somadas
+        merged = {}
+        for s in self.spans:
+            m = merged.setdefault(s.name, Span(s.name))
+            m.ms += s.ms
+            m.add(**s.counts)
+        return {"trace": self.name, "total_ms": round(self.total_ms, 1), "stages": [s.as_dict() for s in merged.values()]}
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, span):
+        with self.lock:
+            m = self.stages.setdefault(span.name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, **dict.fromkeys(COUNTERS, 0)})
+            m["count"] += 1
+            m["total_ms"] += span.ms
+            m["max_ms"] = max(m["max_ms"], span.ms)
+            for k, v in span.counts.items(): m[k] = m.get(k, 0) + v
+
+    def snapshot(self):
+        with self.lock:
+            return [{"stage": k, **v, "avg_ms": round(v["total_ms"] / v["count"], 1) if v["count"] else 0.0} for k, v in sorted(self.stages.items())]
+
+    def export_json(self):
+        return json.dumps({"ts": time.time(), "stages": self.snapshot()}, ensure_ascii=False)
+
+METRICS = Metrics()
+
+@contextmanager
+def trace(name):
+    t = Trace(name)
+    token = _current.set(t)
+    try: yield t
+    finally:
+        _current.reset(token)
+        t.total_ms = (time.perf_counter() - t.started) * 1000
+        logger.info(json.dumps(t.summary(), ensure_ascii=False))
+
+def record_stage(name, ms, **counts):
+    span = Span(name)
+    span.ms = ms
+    span.add(**counts)
+    METRICS.record(span)
+    t = _current.get()
+    if t is not None: t.spans.append(span)
+    return span
+
+@contextmanager
+def stage(name, **counts):
+    # Fora de um trace a etapa ainda entra no agregado METRICS
+    span = Span(name)
+    span.add(**counts)
+    started = time.perf_counter()
+    try: yield span
+    finally:
+        span.ms = (time.perf_counter() - started) * 1000
+        METRICS.record(span)
+        t = _current.get()
+        if t is not None: t.spans.append(span)
+
+def enable_log(level=logging.INFO):
+    # Uma linha JSON por trace no stderr (coletável por qualquer agregador de logs)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import numpy as np
+
+# ==============================================================================
+# ÍNDICE VETORIAL LOCAL (ALTERNATIVA AO RPC match_movies / match_tv_shows)
+# Snapshot em disco: <dir>/<tabela>.npy (float32, normalizado, via mmap)
+#                    <dir>/<tabela>.rows.json (colunas da linha, sem o embedding)
+# Atualizar:  python vector_index.py refresh [movies|tv_shows ...]
+# ==============================================================================
+
+INDEX_DIR = ".cache/index"
+RPC_TABLES = {"match_movies": "movies", "match_tv_shows": "tv_shows"}
+EMBEDDING_COLUMN = "embedding"
+PAGE_SIZE = 1000
+
+class LocalVectorIndex:
+    def __init__(self, matrix, rows):
+        self.matrix = matrix
+        self.rows = rows
+        self.ids = np.asarray([r["id"] for r in rows], dtype=np.int64)
+        self.positions = None
+
+    @classmethod
+    def load(cls, table, index_dir=INDEX_DIR):
+        base = os.path.join(index_dir, table)
+        if not (os.path.exists(base + ".npy") and os.path.exists(base + ".rows.json")): return None
+        matrix = np.load(base + ".npy", mmap_mode="r")
+        with open(base + ".rows.json", encoding="utf-8") as f: rows = json.load(f)
+        return cls(matrix, rows)
+
+    def vectors_for(self, ids):
+        # Linhas da matriz (já normalizadas) na ordem de 'ids'; None se algum id não estiver no snapshot
+        if self.positions is None: self.positions = {int(i): n for n, i in enumerate(self.ids)}
+        rows = [self.positions.get(int(i)) for i in ids]
+        if any(r is None for r in rows): return None
+        return np.asarray(self.matrix[rows], dtype=np.float32)
+
+    def vectors_by_id(self, ids):
+        # {id: vetor} só dos ids presentes no snapshot
+        if self.positions is None: self.positions = {int(i): n for n, i in enumerate(self.ids)}
+        return {int(i): np.asarray(self.matrix[self.positions[int(i)]], dtype=np.float32) for i in ids if int(i) in self.positions}
+
+    def match(self, query_embedding, match_threshold, match_count, filter_ids=()):
+        # Mesmo contrato do RPC: similaridade de cosseno > threshold, ordem decrescente, sem os filter_ids
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        sims = self.matrix @ q
+        keep = sims > match_threshold
+        if len(filter_ids): keep &= ~np.isin(self.ids, np.fromiter(filter_ids, dtype=np.int64))
+        candidates = np.flatnonzero(keep)
+        if len(candidates) > match_count:
+            candidates = candidates[np.argpartition(-sims[candidates], match_count - 1)[:match_count]]
+        candidates = candidates[np.argsort(-sims[candidates])]
+        return [dict(self.rows[i], similarity=float(sims[i])) for i in candidates]
+
+def parse_embedding(value):
+    # pgvector chega via PostgREST como texto "[0.1,0.2,...]"
+    return json.loads(value) if isinstance(value, str) else value
+
+def build_snapshot(client, table, index_dir=INDEX_DIR):
+    vectors, rows, start = [], [], 0
+    while True:
+        page = client.table(table).select("*").order("id").range(start, start + PAGE_SIZE - 1).execute().data
+        for r in page:
+            emb = r.pop(EMBEDDING_COLUMN, None)
+            if emb is None: continue
+            vectors.append(parse_embedding(emb))
+            rows.append(r)
+        if len(page) < PAGE_SIZE: break
+        start += PAGE_SIZE
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if len(matrix): matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    # Escreve em arquivos temporários e troca atomicamente: leitores com mmap nunca veem snapshot pela metade
+    os.makedirs(index_dir, exist_ok=True)
+    base = os.path.join(index_dir, table)
+    np.save(base + ".tmp.npy", matrix)
+    with open(base + ".rows.tmp.json", "w", encoding="utf-8") as f: json.dump(rows, f, ensure_ascii=False)
+    os.replace(base + ".tmp.npy", base + ".npy")
+    os.replace(base + ".rows.tmp.json", base + ".rows.json")
+    return len(rows)
+
+def main(argv):
+    if not argv or argv[0] != "refresh":
+        print("uso: python vector_index.py refresh [movies|tv_shows ...]")
+        return 1
+    from supabase import create_client
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    for table in argv[1:] or list(RPC_TABLES.values()):
+        print(f"{table}: {build_snapshot(client, table)} vetores")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))